@@ -153,11 +153,16 @@ for key_name, key_value in API_KEYS.items():
 from google.oauth2 import service_account
 from googleapiclient.discovery import build
 from googleapiclient.errors import HttpError
+import google_auth_httplib2
+import httplib2
 
 GOOGLE_SCOPES = [
     'https://www.googleapis.com/auth/drive.file',
     'https://www.googleapis.com/auth/spreadsheets'
 ]
+GOOGLE_HTTP_TIMEOUT = 30
+# retries for idempotent calls only (reads, update); create and append run once
+GOOGLE_API_RETRIES = 5
 
 @st.cache_resource
 def get_google_services():
@@ -175,8 +180,11 @@ def get_google_services():
                 st.secrets["gcp_service_account"],
                 scopes=GOOGLE_SCOPES
             )
-        drive_service = build('drive', 'v3', credentials=creds)
-        sheets_service = build('sheets', 'v4', credentials=creds)
+        # one authorized keep-alive connection per service, reused by every execute()
+        drive_http = google_auth_httplib2.AuthorizedHttp(creds, http=httplib2.Http(timeout=GOOGLE_HTTP_TIMEOUT))
+        sheets_http = google_auth_httplib2.AuthorizedHttp(creds, http=httplib2.Http(timeout=GOOGLE_HTTP_TIMEOUT))
+        drive_service = build('drive', 'v3', http=drive_http, cache_discovery=False)
+        sheets_service = build('sheets', 'v4', http=sheets_http, cache_discovery=False)
         return drive_service, sheets_service
     except Exception as e:
         st.error(f"❌ connection error to Google: {e}")
@@ -200,7 +208,7 @@ def find_or_create_data_table(drive_service, sheets_service, folder_id=None):
         
         results = drive_service.files().list(
             q=query, spaces='drive', fields='files(id, name, webViewLink)', pageSize=1
-        ).execute()
+        ).execute(num_retries=GOOGLE_API_RETRIES)
         
         files = results.get('files', [])
         
@@ -217,13 +225,13 @@ def find_or_create_data_table(drive_service, sheets_service, folder_id=None):
                 'sheets': [{'properties': {'title': 'Data', 'gridProperties': {'frozenRowCount': 1}}}]
             },
             fields='spreadsheetId'
-        ).execute()
+        ).execute()  # not retried, a lost response would create a second table
         
         file_id = spreadsheet.get('spreadsheetId')
         file_url = f"https://docs.google.com/spreadsheets/d/{file_id}/edit"
         
         if folder_id:
-            drive_service.files().update(fileId=file_id, addParents=folder_id, fields='id, parents').execute()
+            drive_service.files().update(fileId=file_id, addParents=folder_id, fields='id, parents').execute(num_retries=GOOGLE_API_RETRIES)
         
         print(f"   ✅ new table created: {file_id}")
         return file_id, file_url, False
@@ -1487,7 +1495,7 @@ def append_excel_data_to_sheets(excel_path, folder_id=None, exhibition_name=None
         
         result = sheets_service.spreadsheets().values().get(
             spreadsheetId=file_id, range=f'{sheet_name}!1:1'
-        ).execute()
+        ).execute(num_retries=GOOGLE_API_RETRIES)
         
         existing_headers = result.get('values', [[]])[0] if result.get('values') else []
         new_headers = df.columns.tolist()
@@ -1495,7 +1503,7 @@ def append_excel_data_to_sheets(excel_path, folder_id=None, exhibition_name=None
         print(f"   📋 Existing columns: {len(existing_headers)} | New columns: {len(new_headers)}")
         
         if not existing_headers:
-            values = [new_headers] + df.values.tolist()
+            header_rows = [new_headers]
             print(f"   ℹ️ Empty table, adding {len(new_headers)} columns")
         else:
             new_columns = [col for col in new_headers if col not in existing_headers]
@@ -1515,11 +1523,11 @@ def append_excel_data_to_sheets(excel_path, folder_id=None, exhibition_name=None
                     range=f'{sheet_name}!1:1',
                     valueInputOption='USER_ENTERED',
                     body={'values': [all_columns]}
-                ).execute()
+                ).execute(num_retries=GOOGLE_API_RETRIES)
                 
                 result = sheets_service.spreadsheets().values().get(
                     spreadsheetId=file_id, range=f'{sheet_name}!A:A'
-                ).execute()
+                ).execute(num_retries=GOOGLE_API_RETRIES)
                 existing_rows_count = len(result.get('values', [])) - 1
                 
                 if existing_rows_count > 0:
@@ -1534,26 +1542,24 @@ def append_excel_data_to_sheets(excel_path, folder_id=None, exhibition_name=None
                         range=f'{sheet_name}!{start_col_letter}2:{end_col_letter}{existing_rows_count+1}',
                         valueInputOption='USER_ENTERED',
                         body={'values': empty_values}
-                    ).execute()
+                    ).execute(num_retries=GOOGLE_API_RETRIES)
                     print(f"   ✅ Old rows updated")
             
-            for col in all_columns:
-                if col not in df.columns:
-                    df[col] = ''
-            
-            df = df[all_columns]
+            # add missing columns as '' and reorder in one pass
+            df = df.reindex(columns=all_columns, fill_value='')
             print(f"   ✅ DataFrame sorted: {len(df)} rows × {len(all_columns)} columns")
-            values = df.values.tolist()
+            header_rows = []
 
         # ✅ convert all nan or none to string before sending to sheets
         def clean_cell(cell):
             """complete cell cleaning"""
-            if pd.isna(cell) or cell is None:
+            # NaT / pd.NA fall through to the string check below
+            if cell is None or (isinstance(cell, float) and cell != cell):
                 return ""
             cell_str = str(cell).strip()
     
             # check unwanted values
-            if cell_str.lower() in ['nan', 'none', 'nat', '<na>', 'null']:
+            if cell_str.lower() in {'nan', 'none', 'nat', '<na>', 'null'}:
                 return ""
             
             # remove excel errors
@@ -1562,11 +1568,28 @@ def append_excel_data_to_sheets(excel_path, folder_id=None, exhibition_name=None
     
             return cell_str
 
-        values = [[clean_cell(cell) for cell in row] for row in values]
+        # only columns that may still hold nan/none/errors are cleaned (column-wise,
+        # same rules as clean_cell); object columns were already stripped above
+        bad_cell_pattern = r'^(?:#|(?:nan|none|nat|<na>|null)$)'
+        bad_cell_values = ['nan', 'none', 'nat', '<na>', 'null']
+        columns = []
+        for col in df.columns:
+            col_values = df[col]
+            arr = col_values.to_numpy(dtype=object)
+            if not (col_values.dtype == 'object'
+                    and col_values.map(type).eq(str).all()
+                    and not col_values.str.match(bad_cell_pattern, case=False).any()):
+                arr = np.char.strip(np.where(pd.isna(arr), '', arr).astype(str))
+                bad = np.isin(np.char.lower(arr), bad_cell_values) | np.char.startswith(arr, '#')
+                arr = np.where(bad, '', arr)
+            columns.append(arr)
+
+        rows = np.stack(columns, axis=1).tolist() if columns else []
+        values = [[clean_cell(cell) for cell in row] for row in header_rows] + rows
         
         result = sheets_service.spreadsheets().values().get(
             spreadsheetId=file_id, range=f'{sheet_name}!A:A'
-        ).execute()
+        ).execute(num_retries=GOOGLE_API_RETRIES)
         existing_rows = len(result.get('values', []))
         
         print(f"   📊 Current rows: {existing_rows}")
@@ -1582,7 +1605,7 @@ def append_excel_data_to_sheets(excel_path, folder_id=None, exhibition_name=None
                 valueInputOption='USER_ENTERED',
                 insertDataOption='INSERT_ROWS',
                 body=body
-            ).execute()
+            ).execute()  # not retried, a lost response would append the rows twice
     
             updated_rows = result.get('updates', {}).get('updatedRows', 0)
             total_rows = existing_rows + updated_rows
@@ -1623,7 +1646,7 @@ def append_excel_data_to_sheets(excel_path, folder_id=None, exhibition_name=None
 
         result = sheets_service.spreadsheets().values().get(
             spreadsheetId=file_id, range=f'{sheet_name}!1:1'
-        ).execute()
+        ).execute(num_retries=GOOGLE_API_RETRIES)
         total_columns = len(result.get('values', [[]])[0])
         
         total_cells = total_rows * total_columns
@@ -1657,7 +1680,7 @@ def get_or_create_folder(folder_name="Exhibition_Data"):
         query = f"name='{folder_name}' and mimeType='application/vnd.google-apps.folder' and trashed=false"
         results = drive_service.files().list(
             q=query, spaces='drive', fields='files(id, name)', pageSize=1
-        ).execute()
+        ).execute(num_retries=GOOGLE_API_RETRIES)
         files = results.get('files', [])
         
         if files:
@@ -1667,7 +1690,7 @@ def get_or_create_folder(folder_name="Exhibition_Data"):
         folder = drive_service.files().create(
             body={'name': folder_name, 'mimeType': 'application/vnd.google-apps.folder'},
             fields='id'
-        ).execute()
+        ).execute()  # not retried, a lost response would create a second folder
         print(f"   ✅ new folder: {folder_name}")
         return folder.get('id')
         
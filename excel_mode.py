@@ -5,16 +5,38 @@ professional web scraping from excel + smart gemini analysis + translation
 """
 
 from pathlib import Path
-import os, json, re, time, random, threading, socket, shutil
-from queue import Queue
-from urllib.parse import urljoin, urlparse
-import requests
+import os, json, re, time, random, shutil, threading, hashlib, sqlite3
+import asyncio
+from functools import lru_cache
+from urllib.parse import urljoin, urlparse, urlsplit, urlunsplit, parse_qsl, urlencode
+import aiohttp
 from bs4 import BeautifulSoup
 import warnings
 warnings.filterwarnings("ignore")
 import pandas as pd
-import urllib3
-urllib3.disable_warnings(urllib3.exceptions.InsecureRequestWarning)
+import numpy as np
+from openpyxl import Workbook
+
+# optional arrow-backed string columns for scraped results
+try:
+    import pyarrow as pa
+    HAS_PYARROW = True
+except ImportError:
+    HAS_PYARROW = False
+
+# c parser when available, stdlib parser otherwise
+try:
+    import lxml
+    HTML_PARSER = "lxml"
+except ImportError:
+    HTML_PARSER = "html.parser"
+
+# faster json when available
+try:
+    import orjson
+    HAS_ORJSON = True
+except ImportError:
+    HAS_ORJSON = False
 
 import sys
 import io
@@ -63,8 +85,11 @@ OUTPUT_EXCEL = Path(os.getenv(
     "OUTPUT_EXCEL", 
     SESSION_DIR / f"output_enriched_{pd.Timestamp.now().strftime('%Y%m%d_%H%M%S')}.xlsx"
 ))
-TEMP_EXCEL = Path(os.getenv("TEMP_EXCEL", SESSION_DIR / "temp_output.xlsx"))
+# temp file next to the output so the final swap is an atomic rename
+TEMP_EXCEL = Path(os.getenv("TEMP_EXCEL", OUTPUT_EXCEL.with_name(OUTPUT_EXCEL.stem + ".tmp.xlsx")))
 OUTPUT_JSON = Path(os.getenv("OUTPUT_JSON", SESSION_DIR / "scraped_data.json"))
+OUTPUT_JSONL = OUTPUT_JSON.with_suffix(".jsonl")
+GEMINI_CACHE = Path(os.getenv("GEMINI_CACHE", SESSION_DIR / "gemini_cache.sqlite"))
 
 
 # ^^^^^^^^^^^^^^^^^^^^^ settings
@@ -72,15 +97,27 @@ OUTPUT_JSON = Path(os.getenv("OUTPUT_JSON", SESSION_DIR / "scraped_data.json"))
 GOOGLE_API_KEY = "AIza***WI"
 
 MODEL_NAME = "gemini-2.0-flash-exp"
-THREAD_COUNT = 5
+SITE_CONCURRENCY = int(os.getenv("SITE_CONCURRENCY", "20"))
+HTTP_CONCURRENCY = int(os.getenv("HTTP_CONCURRENCY", "64"))
+DNS_WORKERS = int(os.getenv("DNS_WORKERS", "32"))
+DNS_TIMEOUT = float(os.getenv("DNS_TIMEOUT", "5"))
+GEMINI_BATCH = int(os.getenv("GEMINI_BATCH", "5"))
+GEMINI_CONCURRENCY = int(os.getenv("GEMINI_CONCURRENCY", "10"))
 MAX_DEPTH = 2
 MAX_PAGES_PER_SITE = 25
 REQUEST_TIMEOUT = (8, 20)
 SLEEP_BETWEEN = (0.8, 2.0)
 MAX_RETRIES_HTTP = 3
 MAX_RETRIES_GEMINI = 3
+# text budgets in utf-8 bytes (persian is 2 bytes per char)
+PAGE_TEXT_BYTES = 40000
+SITE_TEXT_BYTES = 180000
+PROMPT_TEXT_BYTES = 8000
 IRANIAN_TLDS = ['.ir', '.ac.ir', '.co.ir', '.org.ir', '.gov.ir', '.id.ir', '.net.ir']
 
+# one suffix test for all iranian tlds (optional port allowed)
+_IR_SUFFIX_RX = re.compile("(?:" + "|".join(map(re.escape, IRANIAN_TLDS)) + r")(?::\d+)?$")
+
 # fields to extract
 FIELDS = [
     "CompanyNameEN", "CompanyNameFA", "Logo", "Industry", "Certifications",
@@ -113,7 +150,6 @@ HEADERS = {
     "Connection": "keep-alive",
 }
 
-lock = threading.Lock()
 client = genai.Client(api_key=GOOGLE_API_KEY)
 
 print(f"\n{'='*70}")
@@ -125,7 +161,46 @@ print(f"output: {OUTPUT_EXCEL}")
 print(f"{'='*70}\n")
 
 
+# compiled patterns
+_WS_RX = re.compile(r"\s+")
+_COL_INDEX_RX = re.compile(r'\[\d+\]$')
+
+# persian -> english digits
+_FA_EN_DIGITS = str.maketrans('۰۱۲۳۴۵۶۷۸۹', '0123456789')
+
+
 # helper functions
+def json_loads(txt):
+    return orjson.loads(txt) if HAS_ORJSON else json.loads(txt)
+
+def json_dump_bytes(obj):
+    if HAS_ORJSON:
+        return orjson.dumps(obj, option=orjson.OPT_INDENT_2 | orjson.OPT_NON_STR_KEYS)
+    return json.dumps(obj, ensure_ascii=False, indent=2).encode("utf-8")
+
+def json_line(obj):
+    if HAS_ORJSON:
+        return orjson.dumps(obj, option=orjson.OPT_NON_STR_KEYS | orjson.OPT_APPEND_NEWLINE)
+    return (json.dumps(obj, ensure_ascii=False) + "\n").encode("utf-8")
+
+def open_log(path):
+    """append-mode jsonl log, records of a crashed earlier run are kept"""
+    log = open(path, "ab")
+    # a crash can leave a torn last line, start ours on a fresh one
+    if log.tell() > 0:
+        with open(path, "rb") as f:
+            f.seek(-1, os.SEEK_END)
+            if f.read(1) != b"\n":
+                log.write(b"\n")
+    return log
+
+def utf8_truncate(s, n):
+    """cut a string to at most n utf-8 bytes without splitting a character"""
+    b = s.encode("utf-8")
+    if len(b) <= n:
+        return s
+    return b[:n].decode("utf-8", "ignore")
+
 def normalize_url(url):
     """url normalization"""
     if not url or pd.isna(url) or str(url).lower() in ['nan', 'none', '']:
@@ -139,6 +214,7 @@ def normalize_url(url):
         return f'https://{url}'
     return None
 
+@lru_cache(maxsize=4096)
 def normalize_root(url):
     """extract root domain"""
     u = normalize_url(url)
@@ -147,122 +223,149 @@ def normalize_root(url):
     p = urlparse(u)
     return f"{p.scheme}://{p.netloc}".lower()
 
+@lru_cache(maxsize=4096)
+def _is_iranian_netloc(netloc):
+    return _IR_SUFFIX_RX.search(netloc) is not None
+
 def is_iranian_domain(url):
     """detect iranian domain"""
     try:
-        netloc = urlparse(normalize_root(url)).netloc.lower()
-        return any(netloc.endswith(tld) for tld in IRANIAN_TLDS)
+        return _is_iranian_netloc(urlparse(normalize_root(url)).netloc.lower())
     except:
         return False
 
-def domain_exists(url):
-    """check domain existence"""
-    try:
-        host = urlparse(normalize_root(url)).netloc
-        socket.gethostbyname(host)
-        return True
-    except:
-        return False
+async def _check_host(host, sem):
+    async with sem:
+        try:
+            loop = asyncio.get_running_loop()
+            await asyncio.wait_for(loop.getaddrinfo(host, None), DNS_TIMEOUT)
+            return True
+        except Exception:
+            return False
 
-def are_values_same(v1, v2):
-    """check if two values are the same"""
-    if not v1 or not v2:
-        return False
-    return str(v1).strip().lower() == str(v2).strip().lower()
+async def check_hosts(hosts):
+    """resolve many hosts concurrently, returns {host: alive}"""
+    sem = asyncio.Semaphore(max(1, DNS_WORKERS))
+    alive = await asyncio.gather(*(_check_host(h, sem) for h in hosts))
+    return dict(zip(hosts, alive))
+
+@lru_cache(maxsize=16384)
+def canonical_url(url):
+    """crawl dedupe key: no fragment, lower host, sorted query, no default port or trailing slash"""
+    p = urlsplit(url)
+    scheme = p.scheme.lower()
+    netloc = p.netloc.lower()
+    if (scheme, netloc.rsplit(":", 1)[-1]) in (("http", "80"), ("https", "443")):
+        netloc = netloc.rsplit(":", 1)[0]
+    query = urlencode(sorted(parse_qsl(p.query, keep_blank_values=True)))
+    return urlunsplit((scheme, netloc, p.path.rstrip("/") or "/", query, ""))
 
+def fast_to_excel(df, path):
+    """stream dataframe rows to xlsx with openpyxl write-only mode"""
+    wb = Workbook(write_only=True)
+    ws = wb.create_sheet("Sheet1")
+    ws.append([str(c) for c in df.columns])
+    # nan cells would be written as invalid numbers
+    values = df.astype(object).where(df.notna(), None)
+    for row in values.itertuples(index=False, name=None):
+        ws.append(row)
+    wb.save(path)
 
 
 # web scraping with smart ssl
-def fetch(url):
+async def fetch(session, url, verify_ssl=None):
     """fetch page content with smart ssl management"""
-    verify_ssl = not is_iranian_domain(url)
+    if verify_ssl is None:
+        verify_ssl = not is_iranian_domain(url)
     ssl_status = "ssl on" if verify_ssl else "ssl off (iranian)"
     
     for i in range(MAX_RETRIES_HTTP):
         try:
             print(f"       attempt {i+1}/{MAX_RETRIES_HTTP} [{ssl_status}]")
-            r = requests.get(
-                url,
-                headers=HEADERS,
-                timeout=REQUEST_TIMEOUT,
-                verify=verify_ssl,
-                allow_redirects=True
-            )
-            if r.status_code == 200:
-                return (r.text, "")
-            else:
+            async with session.get(url, ssl=verify_ssl, allow_redirects=True) as r:
+                if r.status == 200:
+                    return (await r.text(errors="replace"), "")
                 if i == MAX_RETRIES_HTTP - 1:
-                    return ("", f"HTTP_{r.status_code}")
-        except requests.exceptions.SSLError:
+                    return ("", f"HTTP_{r.status}")
+        except aiohttp.ClientSSLError:
             if verify_ssl and i == 0:
                 try:
-                    r = requests.get(url, headers=HEADERS, timeout=REQUEST_TIMEOUT, 
-                                   verify=False, allow_redirects=True)
-                    if r.status_code == 200:
-                        return (r.text, "")
+                    async with session.get(url, ssl=False, allow_redirects=True) as r:
+                        if r.status == 200:
+                            return (await r.text(errors="replace"), "")
                 except:
                     pass
             if i == MAX_RETRIES_HTTP - 1:
                 return ("", "SSL_ERROR")
-        except requests.exceptions.Timeout:
+        except asyncio.TimeoutError:
             if i == MAX_RETRIES_HTTP - 1:
                 return ("", "TIMEOUT")
-        except requests.exceptions.ConnectionError:
+        except aiohttp.ClientConnectionError:
             if i == MAX_RETRIES_HTTP - 1:
                 return ("", "CONNECTION_ERROR")
         except Exception as e:
             if i == MAX_RETRIES_HTTP - 1:
                 return ("", f"ERROR: {str(e)[:50]}")
         
-        time.sleep(2.0 * (i + 1))
+        await asyncio.sleep(2.0 * (i + 1))
     
     return ("", "MAX_RETRIES")
 
-def clean_text(html):
-    """clean html and extract text"""
+def parse_page(html, want_links=True):
+    """one parse per page: cleaned text and the hrefs of its links"""
     if not html:
-        return ""
-    soup = BeautifulSoup(html, "html.parser")
+        return ("", [])
+    soup = BeautifulSoup(html, HTML_PARSER)
+    # links first, nav/footer hold most of them and are dropped below
+    hrefs = [a["href"] for a in soup.find_all("a", href=True)] if want_links else []
     for tag in soup(["script", "style", "noscript", "iframe", "svg", "nav", "footer"]):
         tag.extract()
     text = soup.get_text(" ", strip=True)
-    return re.sub(r"\s+", " ", text).strip()
+    return (_WS_RX.sub(" ", text).strip(), hrefs)
 
-def crawl_site(root):
-    """complete site crawl"""
+async def crawl_site(session, root):
+    """complete site crawl (breadth-first, one depth level at a time)"""
     print(f"   crawling: {root}")
+    # every crawled page is under root, classify the host once
+    verify_ssl = not is_iranian_domain(root)
     seen = set()
-    q = [(root, 0)]
+    level = [root]
     texts = []
     errors = []
     
-    while q and len(seen) < MAX_PAGES_PER_SITE:
-        url, depth = q.pop(0)
-        if url in seen or depth > MAX_DEPTH:
-            continue
-        seen.add(url)
-        
-        html, error = fetch(url)
-        
-        if error:
-            errors.append(f"{url}: {error}")
-            continue
+    for depth in range(MAX_DEPTH + 1):
+        batch = []
+        for url in level:
+            key = canonical_url(url)
+            if key not in seen and len(seen) < MAX_PAGES_PER_SITE:
+                seen.add(key)
+                batch.append(url)
+        if not batch:
+            break
         
-        txt = clean_text(html)
-        if txt:
-            texts.append(txt[:40000])
-            print(f"       extracted {len(txt)} chars")
+        # pages of the same depth are fetched together
+        pages = await asyncio.gather(*(fetch(session, url, verify_ssl) for url in batch))
         
-        if html and depth < MAX_DEPTH:
-            soup = BeautifulSoup(html, "html.parser")
-            for a in soup.find_all("a", href=True):
-                next_url = urljoin(root, a["href"])
-                if next_url.startswith(root) and next_url not in seen:
-                    q.append((next_url, depth + 1))
+        next_level = []
+        for url, (html, error) in zip(batch, pages):
+            if error:
+                errors.append(f"{url}: {error}")
+                continue
+            
+            txt, hrefs = parse_page(html, want_links=depth < MAX_DEPTH)
+            if txt:
+                texts.append(utf8_truncate(txt, PAGE_TEXT_BYTES))
+                print(f"       extracted {len(txt)} chars")
+            
+            for href in hrefs:
+                next_url = urljoin(root, href)
+                if next_url.startswith(root) and canonical_url(next_url) not in seen:
+                    next_level.append(next_url)
         
-        time.sleep(random.uniform(*SLEEP_BETWEEN))
+        level = next_level
+        await asyncio.sleep(random.uniform(*SLEEP_BETWEEN))
     
-    combined = "\n".join(texts)[:180000]
+    combined = utf8_truncate("\n".join(texts), SITE_TEXT_BYTES)
     
     if not combined:
         error_summary = "; ".join(errors[:3])
@@ -295,9 +398,32 @@ fields json:
 {json_chunk}
 """
 
-def gemini_json(prompt, schema):
-    """request to gemini with json output"""
+PROMPT_EXTRACT_BATCH = """
+you are a bilingual (persian-english) company information extractor.
+for each website below, extract the following json fields from its text.
+return only a strict json array with one object per website, in the same order,
+and set "site" to the website number. if a field has no value, return empty string "".
+
+fields:
+{fields}
+
+{sites}
+"""
+
+PROMPT_TRANSLATE_EN2FA_BATCH = """
+translate the english fields of every site below into formal persian.
+return only valid json with the same site keys and field keys and persian values.
+
+sites json:
+{json_chunk}
+"""
+
+def gemini_json(prompt, schema, array=False):
+    """request to gemini with json output (one object, or an array of objects)"""
     schema_obj = types.Schema(type=types.Type.OBJECT, properties=schema, required=[])
+    if array:
+        schema_obj = types.Schema(type=types.Type.ARRAY, items=schema_obj)
+    empty = [] if array else {}
     
     for i in range(MAX_RETRIES_GEMINI):
         try:
@@ -310,21 +436,96 @@ def gemini_json(prompt, schema):
                     response_schema=schema_obj
                 )
             )
-            return json.loads(resp.text)
+            return json_loads(resp.text)
         except Exception as e:
             print(f"       gemini error (attempt {i+1}): {str(e)[:100]}")
             if i == MAX_RETRIES_GEMINI - 1:
-                return {}
+                return empty
             time.sleep(2 * (i + 1))
-    return {}
+    return empty
+
+# content-addressed cache of gemini answers (shared across runs).
+# one sqlite connection used from the loop and worker threads, every access under the lock
+_cache = None
+_cache_lock = threading.Lock()
+
+def _open_cache():
+    # caller holds _cache_lock
+    global _cache
+    if _cache is None:
+        try:
+            _cache = sqlite3.connect(str(GEMINI_CACHE), check_same_thread=False)
+            _cache.execute("CREATE TABLE IF NOT EXISTS cache (key TEXT PRIMARY KEY, value TEXT)")
+            _cache.commit()
+        except Exception as e:
+            # keep deduping within this run at least
+            print(f"       gemini cache unavailable, using memory: {e}")
+            _cache = {}
+    return _cache
+
+def _cache_key(kind, payload):
+    return hashlib.sha1(f"{MODEL_NAME}|{kind}|{payload}".encode("utf-8")).hexdigest()
+
+def cache_get(key):
+    with _cache_lock:
+        db = _open_cache()
+        try:
+            if isinstance(db, dict):
+                return db.get(key)
+            row = db.execute("SELECT value FROM cache WHERE key = ?", (key,)).fetchone()
+            return json_loads(row[0]) if row else None
+        except Exception:
+            return None
+
+def cache_put(key, value):
+    with _cache_lock:
+        db = _open_cache()
+        try:
+            if isinstance(db, dict):
+                db[key] = value
+            else:
+                db.execute("INSERT OR REPLACE INTO cache (key, value) VALUES (?, ?)",
+                           (key, json.dumps(value, ensure_ascii=False)))
+                db.commit()
+        except Exception:
+            pass
+
+def close_cache():
+    global _cache
+    with _cache_lock:
+        try:
+            if _cache is not None and hasattr(_cache, "close"):
+                _cache.close()
+        except Exception as e:
+            # the answers are already committed, never worth failing the run over
+            print(f"       gemini cache close failed: {e}")
+        _cache = None
+
+def _translation_key(to_translate):
+    return _cache_key("translate", json.dumps(to_translate, ensure_ascii=False, sort_keys=True))
+
+def _apply_translation(data, tr):
+    for en, fa_col in TRANSLATABLE_FIELDS:
+        if en in tr:
+            data[fa_col] = tr[en] or ""
 
 def extract_with_gemini(text):
     """extract information with gemini"""
+    text = utf8_truncate(text, PROMPT_TEXT_BYTES)
+    key = _cache_key("extract", text)
+    cached = cache_get(key)
+    if cached is not None:
+        return dict(cached)
+    
     fields = "\n".join([f"- {f}" for f in FIELDS])
-    prompt = PROMPT_EXTRACT.format(fields=fields, text=text[:8000])
+    prompt = PROMPT_EXTRACT.format(fields=fields, text=text)
     schema = {f: types.Schema(type=types.Type.STRING, nullable=True) for f in FIELDS}
     data = gemini_json(prompt, schema)
-    return {f: (data.get(f) or "") for f in FIELDS}
+    data = {f: (data.get(f) or "") for f in FIELDS}
+    # failed calls come back empty, those are not cached
+    if any(data.values()):
+        cache_put(key, data)
+    return data
 
 def translate_fields(data):
     """translate english fields to persian"""
@@ -338,15 +539,105 @@ def translate_fields(data):
     if not to_translate:
         return data
     
-    prompt = PROMPT_TRANSLATE_EN2FA.format(json_chunk=json.dumps(to_translate, ensure_ascii=False))
-    schema = {k: types.Schema(type=types.Type.STRING, nullable=True) for k in to_translate.keys()}
+    key = _translation_key(to_translate)
+    tr = cache_get(key)
+    if tr is None:
+        prompt = PROMPT_TRANSLATE_EN2FA.format(json_chunk=json.dumps(to_translate, ensure_ascii=False))
+        schema = {k: types.Schema(type=types.Type.STRING, nullable=True) for k in to_translate.keys()}
+        tr = gemini_json(prompt, schema)
+        if tr:
+            cache_put(key, tr)
+    
+    _apply_translation(data, tr)
+    return data
+
+
+def extract_batch_with_gemini(texts):
+    """extract information for several sites with one gemini request"""
+    texts = [utf8_truncate(t, PROMPT_TEXT_BYTES) for t in texts]
+    out = [cache_get(_cache_key("extract", t)) for t in texts]
+    out = [dict(d) if d is not None else None for d in out]
+    todo = [i for i, d in enumerate(out) if d is None]
+    
+    if len(todo) <= 1:
+        for i in todo:
+            out[i] = extract_with_gemini(texts[i])
+        return out
+    
+    # only uncached texts go into the batch, numbered by their place in todo
+    fields = "\n".join([f"- {f}" for f in FIELDS])
+    sites = "\n\n".join(f"website {n}:\n---\n{texts[i]}\n---" for n, i in enumerate(todo))
+    prompt = PROMPT_EXTRACT_BATCH.format(fields=fields, sites=sites)
+    schema = {f: types.Schema(type=types.Type.STRING, nullable=True) for f in FIELDS}
+    schema["site"] = types.Schema(type=types.Type.INTEGER)
+    items = gemini_json(prompt, schema, array=True)
+    
+    # match answers by site number, fall back to position
+    by_site = {}
+    for pos, item in enumerate(items if isinstance(items, list) else []):
+        if not isinstance(item, dict):
+            continue
+        site = item.get("site")
+        if not isinstance(site, int) or not 0 <= site < len(todo):
+            site = pos
+        by_site.setdefault(site, item)
+    
+    for n, i in enumerate(todo):
+        data = by_site.get(n)
+        if data is None:
+            print(f"       site {n} missing from batch answer, asking alone")
+            out[i] = extract_with_gemini(texts[i])
+        else:
+            out[i] = {f: (data.get(f) or "") for f in FIELDS}
+            if any(out[i].values()):
+                cache_put(_cache_key("extract", texts[i]), out[i])
+    return out
+
+def translate_fields_batch(items):
+    """translate english fields of several sites with one gemini request"""
+    if len(items) == 1:
+        return [translate_fields(items[0])]
+    
+    chunk = {}
+    for i, data in enumerate(items):
+        for en, fa_col in TRANSLATABLE_FIELDS:
+            if fa_col not in data:
+                data[fa_col] = ""
+        to_translate = {en: data.get(en) for en, _ in TRANSLATABLE_FIELDS if data.get(en)}
+        if not to_translate:
+            continue
+        cached = cache_get(_translation_key(to_translate))
+        if cached is not None:
+            _apply_translation(data, cached)
+        else:
+            chunk[str(i)] = to_translate
+    
+    if len(chunk) <= 1:
+        for k in chunk:
+            items[int(k)] = translate_fields(items[int(k)])
+        return items
+    
+    prompt = PROMPT_TRANSLATE_EN2FA_BATCH.format(json_chunk=json.dumps(chunk, ensure_ascii=False))
+    schema = {
+        k: types.Schema(
+            type=types.Type.OBJECT,
+            properties={f: types.Schema(type=types.Type.STRING, nullable=True) for f in v},
+            required=[],
+        )
+        for k, v in chunk.items()
+    }
     tr = gemini_json(prompt, schema)
     
-    for en, fa_col in TRANSLATABLE_FIELDS:
-        if en in tr:
-            data[fa_col] = tr[en] or ""
+    for k, to_translate in chunk.items():
+        site_tr = tr.get(k)
+        if not isinstance(site_tr, dict):
+            items[int(k)] = translate_fields(items[int(k)])
+            continue
+        _apply_translation(items[int(k)], site_tr)
+        if site_tr:
+            cache_put(_translation_key(to_translate), site_tr)
     
-    return data
+    return items
 
 
 # smart merge with cleanup
@@ -354,72 +645,79 @@ def clean_duplicate_columns(df):
     """remove and merge duplicate columns"""
     print("\ncleaning duplicate columns...")
     
-    # group columns by base name
+    # group column positions by base name
     base_cols = {}
-    pattern = re.compile(r'\[\d+\]$')
     
-    for col in df.columns:
-        # extract base name
-        base = pattern.sub('', str(col))
-        if base not in base_cols:
-            base_cols[base] = []
-        base_cols[base].append(col)
+    for pos, col in enumerate(df.columns):
+        base = _COL_INDEX_RX.sub('', str(col))
+        base_cols.setdefault(base, []).append(pos)
     
-    cleaned_df = df.copy()
+    merged = {}
+    drop_pos = set()
     
     # for each column group
-    for base, cols in base_cols.items():
-        if len(cols) <= 1:
+    for base, positions in base_cols.items():
+        if len(positions) <= 1:
             continue
         
-        print(f"    merging {len(cols)} versions of '{base}'")
+        print(f"    merging {len(positions)} versions of '{base}'")
         
-        # merge all versions
-        for idx in df.index:
-            values = []
-            for col in cols:
-                try:
-                    val = df.at[idx, col]
-                    if val and not pd.isna(val) and str(val).strip() != "":
-                        val_str = str(val).strip()
-                        if val_str not in values:
-                            values.append(val_str)
-                except:
-                    continue
-            
-            # merge with separator
-            if values:
-                if base in ['Phone1', 'Phone2', 'Email', 'OtherEmails', 'WhatsApp', 'Telegram']:
-                    merged = ", ".join(values)
-                elif base in ['ProductName', 'ProductCategory', 'Brands', 'Applications']:
-                    merged = ", ".join(values)
-                else:
-                    if len(values) == 1:
-                        merged = values[0]
-                    else:
-                        merged = f"{values[0]} | {' | '.join(values[1:])}"
-                
-                try:
-                    cleaned_df.at[idx, base] = merged
-                except:
-                    pass
+        # whole group as one block, blank / nan cells become ''
+        raw = df.iloc[:, positions].to_numpy(dtype=object)
+        vals = np.char.strip(raw.astype(str))
+        vals[pd.isna(raw)] = ''
+        
+        if base in ['Phone1', 'Phone2', 'Email', 'OtherEmails', 'WhatsApp', 'Telegram',
+                    'ProductName', 'ProductCategory', 'Brands', 'Applications']:
+            sep = ", "
+        else:
+            sep = " | "
+        
+        # unique values per row, in column order
+        has_values = (vals != '').any(axis=1)
+        if has_values.any():
+            joined = [sep.join(dict.fromkeys(row[row != ''])) for row in vals]
+            merged[base] = (has_values, joined)
         
         # remove duplicate columns
-        for col in cols[1:]:
-            if col in cleaned_df.columns:
-                try:
-                    cleaned_df.drop(columns=[col], inplace=True)
-                except:
-                    pass
+        drop_pos.update(positions[1:])
+    
+    keep = [pos for pos in range(len(df.columns)) if pos not in drop_pos]
+    cleaned_df = df.iloc[:, keep].copy()
+    
+    for base, (has_values, joined) in merged.items():
+        joined = pd.Series(joined, index=cleaned_df.index, dtype=object)
+        if base in cleaned_df.columns:
+            cleaned_df[base] = cleaned_df[base].mask(has_values, joined.to_numpy())
+        else:
+            cleaned_df[base] = joined.where(has_values)
     
     print(f"   reduced from {len(df.columns)} to {len(cleaned_df.columns)} columns")
     return cleaned_df
 
+def _blank_mask(s):
+    """true where a cell is empty, nan or whitespace"""
+    return s.isna() | s.astype(str).str.strip().eq("")
+
+def results_to_frame(results):
+    """build the scraped dataframe column by column"""
+    cols = list(dict.fromkeys(k for d in results for k in d))
+    columns = {c: [d.get(c) for d in results] for c in cols}
+    if not HAS_PYARROW:
+        return pd.DataFrame(columns)
+    
+    # every scraped field is text, arrow string columns skip per-cell objects
+    table = pa.table({
+        c: pa.array([None if v is None else str(v) for v in vals], type=pa.string())
+        for c, vals in columns.items()
+    })
+    return table.to_pandas(types_mapper=pd.ArrowDtype)
+
 def smart_merge(original_df, scraped_data):
     """smart data merge"""
     print("\nsmart merging data...")
     
-    scraped_df = pd.DataFrame(scraped_data)
+    scraped_df = results_to_frame(scraped_data)
     
     if scraped_df.empty:
         print("    no scraped data to merge")
@@ -427,110 +725,178 @@ def smart_merge(original_df, scraped_data):
     
     result_df = original_df.copy()
     
-    for idx, row in result_df.iterrows():
-        original_url = normalize_root(row.get('Website') or row.get('url') or row.get('URL'))
+    # one normalized url key per row (first truthy of Website / url / URL)
+    none_col = [None] * len(result_df)
+    website, url_lower, url_upper = (
+        result_df[c] if c in result_df.columns else none_col
+        for c in ('Website', 'url', 'URL')
+    )
+    keys = [normalize_root(w or u or U) for w, u, U in zip(website, url_lower, url_upper)]
+    
+    # hash join: one scraped row per url, aligned to the original rows
+    scraped_df = scraped_df.drop_duplicates('url').set_index('url')
+    matched = scraped_df.reindex(keys)
+    
+    for col in matched.columns:
+        if col in ['status', 'error']:
+            continue
         
-        if not original_url:
+        new = matched[col]
+        new_ok = ~_blank_mask(new)
+        if not new_ok.any():
             continue
         
-        scraped_row = scraped_df[scraped_df['url'] == original_url]
+        if col not in result_df.columns:
+            result_df[col] = ""
         
-        if scraped_row.empty:
-            continue
+        old = result_df[col]
+        old_empty = _blank_mask(old)
+        same = (
+            old.astype(str).str.strip().str.lower().to_numpy()
+            == new.astype(str).str.strip().str.lower().to_numpy()
+        )
+        fill = new_ok.to_numpy() & old_empty.to_numpy()
+        append = new_ok.to_numpy() & ~old_empty.to_numpy() & ~same
         
-        scraped_row = scraped_row.iloc[0].to_dict()
+        if col in ['Phone1', 'Phone2', 'Email', 'OtherEmails', 'ProductName', 'Brands']:
+            sep = ", "
+        else:
+            sep = " | "
+        combined = old.astype(str).to_numpy() + sep + new.astype(str).to_numpy()
         
-        for col, new_val in scraped_row.items():
-            if col in ['url', 'status', 'error']:
-                continue
-            
-            if not new_val or pd.isna(new_val) or str(new_val).strip() == "":
-                continue
-            
-            if col not in result_df.columns:
-                result_df[col] = ""
-            
-            old_val = row.get(col)
-            
-            if not old_val or pd.isna(old_val) or str(old_val).strip() == "":
-                result_df.at[idx, col] = new_val
-                try:
-                    print(f"    [{idx+1}] {col} = {str(new_val)[:50]}")
-                except:
-                    print(f"    [{idx+1}] {col} = [updated]")
-            elif not are_values_same(old_val, new_val):
-                if col in ['Phone1', 'Phone2', 'Email', 'OtherEmails', 'ProductName', 'Brands']:
-                    result_df.at[idx, col] = f"{old_val}, {new_val}"
-                else:
-                    result_df.at[idx, col] = f"{old_val} | {new_val}"
-                try:
-                    print(f"    [{idx+1}] {col} += {str(new_val)[:50]}")
-                except:
-                    print(f"    [{idx+1}] {col} += [added]")
+        # one store per column
+        result_df[col] = np.where(
+            fill, new.to_numpy(dtype=object),
+            np.where(append, combined, old.to_numpy(dtype=object))
+        )
+        
+        if fill.any() or append.any():
+            print(f"    {col}: {int(fill.sum())} filled, {int(append.sum())} added")
     
     print(f"    merged: {len(result_df)} rows x {len(result_df.columns)} columns")
     return result_df
 
 
-# worker thread
-def worker(q, results):
-    while True:
+# site worker
+def save_results(results):
+    """write the final results array"""
+    try:
+        Path(OUTPUT_JSON).write_bytes(json_dump_bytes(results))
+        return True
+    except Exception as e:
+        print(f"    failed to save json: {e}")
+        return False
+
+async def record(results, lock, log, items):
+    """keep results and append them to the jsonl log (one line per site)"""
+    async with lock:
+        results.extend(items)
         try:
-            item = q.get_nowait()
+            log.write(b"".join(json_line(d) for d in items))
+            log.flush()
         except:
-            break
+            pass
+
+async def analyze_batch(batch, results, lock, log, gemini):
+    """run gemini extraction + translation for a batch of crawled sites"""
+    urls = [url for url, _ in batch]
+    
+    try:
+        # gemini sdk is blocking: run it in threads, at most GEMINI_CONCURRENCY calls at once
+        print(f"\n    analyzing {len(batch)} sites with gemini...")
+        async with gemini:
+            items = await asyncio.to_thread(extract_batch_with_gemini, [text for _, text in batch])
         
-        idx, url = item
+        print(f"    translating {len(batch)} sites to persian...")
+        async with gemini:
+            items = await asyncio.to_thread(translate_fields_batch, items)
         
-        try:
+        for url, data in zip(urls, items):
+            data["url"] = url
+            data["status"] = "SUCCESS"
+            data["error"] = ""
+            print(f"    success: {data.get('CompanyNameEN') or data.get('CompanyNameFA', 'unknown')}")
+    except Exception as e:
+        print(f"    exception: {str(e)[:100]}")
+        items = [
+            {"url": url, "error": f"EXCEPTION: {str(e)[:100]}", "status": "EXCEPTION"}
+            for url in urls
+        ]
+    
+    await record(results, lock, log, items)
+
+async def worker(session, sites, lock, idx, url, results, pending, log, gemini):
+    batch = None
+    
+    try:
+        async with sites:
             print(f"\n{'='*60}")
             print(f"[{idx+1}] processing: {url}")
             print(f"{'='*60}")
             
-            text, error = crawl_site(url)
-            
-            if error or not text:
-                data = {
-                    "url": url,
-                    "error": error or "NO_CONTENT",
-                    "status": "FAILED"
-                }
-                print(f"    failed: {error or 'NO_CONTENT'}")
-            else:
-                print(f"    analyzing with gemini...")
-                data = extract_with_gemini(text)
-                
-                print(f"    translating to persian...")
-                data = translate_fields(data)
-                
-                data["url"] = url
-                data["status"] = "SUCCESS"
-                data["error"] = ""
-                
-                print(f"    success: {data.get('CompanyNameEN') or data.get('CompanyNameFA', 'unknown')}")
-            
-            with lock:
-                results.append(data)
-                try:
-                    Path(OUTPUT_JSON).write_text(
-                        json.dumps(results, ensure_ascii=False, indent=2),
-                        encoding="utf-8"
-                    )
-                except:
-                    pass
-                    
-        except Exception as e:
-            print(f"    exception: {str(e)[:100]}")
+            text, error = await crawl_site(session, url)
+        
+        if error or not text:
             data = {
                 "url": url,
-                "error": f"EXCEPTION: {str(e)[:100]}",
-                "status": "EXCEPTION"
+                "error": error or "NO_CONTENT",
+                "status": "FAILED"
             }
-            with lock:
-                results.append(data)
+            print(f"    failed: {error or 'NO_CONTENT'}")
+            await record(results, lock, log, [data])
+            return
         
-        q.task_done()
-        time.sleep(random.uniform(*SLEEP_BETWEEN))
+        # queue the text, whoever fills the batch sends it to gemini
+        async with lock:
+            pending.append((url, text))
+            if len(pending) >= GEMINI_BATCH:
+                batch = pending[:]
+                pending.clear()
+                
+    except Exception as e:
+        print(f"    exception: {str(e)[:100]}")
+        data = {
+            "url": url,
+            "error": f"EXCEPTION: {str(e)[:100]}",
+            "status": "EXCEPTION"
+        }
+        await record(results, lock, log, [data])
+    
+    if batch:
+        await analyze_batch(batch, results, lock, log, gemini)
+
+
+async def scrape_all(urls):
+    """crawl all sites on one event loop"""
+    results = []
+    pending = []
+    lock = asyncio.Lock()
+    sites = asyncio.Semaphore(SITE_CONCURRENCY)
+    gemini = asyncio.Semaphore(max(1, GEMINI_CONCURRENCY))
+    timeout = aiohttp.ClientTimeout(connect=REQUEST_TIMEOUT[0], total=REQUEST_TIMEOUT[1])
+    # connector limit bounds in-flight requests across all sites
+    connector = aiohttp.TCPConnector(
+        limit=HTTP_CONCURRENCY,
+        limit_per_host=8,
+        resolver=aiohttp.ThreadedResolver(),
+    )
+    
+    with open_log(OUTPUT_JSONL) as log:
+        async with aiohttp.ClientSession(headers=HEADERS, timeout=timeout, connector=connector) as session:
+            await asyncio.gather(*(
+                worker(session, sites, lock, idx, url, results, pending, log, gemini)
+                for idx, url in urls
+            ))
+        
+        # last partial batch
+        if pending:
+            await analyze_batch(pending, results, lock, log, gemini)
+    
+    # full array written once, the jsonl log is only needed for crashed runs
+    if save_results(results):
+        OUTPUT_JSONL.unlink(missing_ok=True)
+    
+    return results
 
 
 # main
@@ -540,7 +906,8 @@ def main():
         print(f"file not found: {INPUT_EXCEL}")
         return
     
-    df = pd.read_excel(INPUT_EXCEL)
+    # all text: skip type inference, empty cells stay ''
+    df = pd.read_excel(INPUT_EXCEL, dtype=str, engine='openpyxl', keep_default_na=False, na_filter=False)
     print(f"    loaded {len(df)} rows, {len(df.columns)} columns")
     
     url_col = None
@@ -556,11 +923,13 @@ def main():
     
     print(f"    url column: '{url_col}'")
     
-    urls = []
-    for idx, row in df.iterrows():
-        url = normalize_root(row[url_col])
-        if url and domain_exists(url):
-            urls.append((idx, url))
+    candidates = [(idx, normalize_root(v)) for idx, v in zip(df.index, df[url_col])]
+    
+    # resolve every unique host once, all lookups in flight together
+    hosts = list({urlparse(url).netloc for _, url in candidates if url} - {""})
+    alive = asyncio.run(check_hosts(hosts))
+    
+    urls = [(idx, url) for idx, url in candidates if url and alive.get(urlparse(url).netloc)]
     
     print(f"    found {len(urls)} valid urls")
     
@@ -568,21 +937,12 @@ def main():
         print("no valid urls to scrape!")
         return
     
-    print(f"\nstarting web scraping ({THREAD_COUNT} threads)...")
-    
-    results = []
-    q = Queue()
-    for item in urls:
-        q.put(item)
-    
-    threads = []
-    for _ in range(min(THREAD_COUNT, len(urls))):
-        t = threading.Thread(target=worker, args=(q, results), daemon=True)
-        t.start()
-        threads.append(t)
+    print(f"\nstarting web scraping ({SITE_CONCURRENCY} sites, {HTTP_CONCURRENCY} connections)...")
     
-    for t in threads:
-        t.join()
+    try:
+        results = asyncio.run(scrape_all(urls))
+    finally:
+        close_cache()
     
     final_df = smart_merge(df, results)
     final_df = clean_duplicate_columns(final_df)
@@ -591,7 +951,7 @@ def main():
     priority_cols = []
     
     for col in df.columns:
-        base_col = re.sub(r'\[\d+\]$', '', str(col))
+        base_col = _COL_INDEX_RX.sub('', str(col))
         if base_col not in priority_cols and base_col in final_df.columns:
             priority_cols.append(base_col)
     
@@ -616,27 +976,19 @@ def main():
     # extra cleanup
     def clean_dataframe_before_excel(df):
         """remove formulas and errors"""
-        import numpy as np
-        
-        for col in df.columns:
-            if df[col].dtype == 'object':
-                # 1. remove excel formulas
-                df[col] = df[col].apply(
-                    lambda x: str(x)[1:] if isinstance(x, str) and str(x).startswith('=') else x
-                )
-                
-                # 2. remove errors
-                df[col] = df[col].apply(
-                    lambda x: "" if isinstance(x, str) and str(x).startswith('#') else x
-                )
-                
-                # 3. convert persian digits
-                persian_digits = '۰۱۲۳۴۵۶۷۸۹'
-                english_digits = '0123456789'
-                trans_table = str.maketrans(persian_digits, english_digits)
-                df[col] = df[col].apply(
-                    lambda x: str(x).translate(trans_table) if isinstance(x, str) else x
-                )
+        for col in df.select_dtypes(include='object').columns:
+            s = df[col]
+            # .str yields nan for non-string cells, those are restored below
+            # 1. remove excel formulas
+            try:
+                txt = s.str.removeprefix('=')
+            except AttributeError:
+                continue  # no string cells in this column
+            # 2. remove errors
+            txt = txt.mask(txt.str.startswith('#', na=False), "")
+            # 3. convert persian digits
+            txt = txt.str.translate(_FA_EN_DIGITS)
+            df[col] = txt.where(txt.notna(), s)
         
         return df
     
@@ -644,13 +996,17 @@ def main():
     print(f"   cleaned {len(final_df.columns)} columns")
     
     try:
-        final_df.to_excel(TEMP_EXCEL, index=False)
-        shutil.move(str(TEMP_EXCEL), str(OUTPUT_EXCEL))
+        fast_to_excel(final_df, TEMP_EXCEL)
+        try:
+            os.replace(TEMP_EXCEL, OUTPUT_EXCEL)
+        except OSError:
+            # TEMP_EXCEL overridden onto another filesystem
+            shutil.move(str(TEMP_EXCEL), str(OUTPUT_EXCEL))
         print(f"    saved: {OUTPUT_EXCEL}")
     except Exception as e:
         print(f"    save failed: {e}")
         try:
-            final_df.to_excel(OUTPUT_EXCEL, index=False)
+            fast_to_excel(final_df, OUTPUT_EXCEL)
             print(f"    saved (direct): {OUTPUT_EXCEL}")
         except Exception as e2:
             print(f"    direct save also failed: {e2}")
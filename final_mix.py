@@ -6,9 +6,50 @@ smart json and excel merge - both sources are always merged
 
 from pathlib import Path
 import os, json, re, pandas as pd
+import numpy as np
 from collections import defaultdict
+from functools import lru_cache
+from concurrent.futures import ProcessPoolExecutor, ThreadPoolExecutor
+from itertools import chain
+from openpyxl import Workbook
 import time
 
+# faster json when available
+try:
+    import orjson
+    HAS_ORJSON = True
+except ImportError:
+    HAS_ORJSON = False
+
+# incremental json parser when available
+try:
+    import ijson
+    HAS_IJSON = True
+except ImportError:
+    HAS_IJSON = False
+
+# streaming xlsx writer when available
+try:
+    import xlsxwriter
+    HAS_XLSXWRITER = True
+except ImportError:
+    HAS_XLSXWRITER = False
+
+# rust xlsx reader when available (pandas accepts the engine from 2.2 on)
+try:
+    import python_calamine
+    _PD_VERSION = tuple(int(p) for p in re.findall(r"\d+", pd.__version__)[:2])
+    EXCEL_READ_ENGINE = 'calamine' if _PD_VERSION >= (2, 2) else 'openpyxl'
+except ImportError:
+    EXCEL_READ_ENGINE = 'openpyxl'
+
+# arrow-backed text columns when available
+try:
+    import pyarrow
+    STRING_DTYPE = 'string[pyarrow]'
+except ImportError:
+    STRING_DTYPE = str
+
 
 # dynamic paths
 SESSION_DIR = Path(os.getenv("SESSION_DIR", Path.cwd()))
@@ -17,6 +58,10 @@ INPUT_EXCEL = Path(os.getenv("INPUT_EXCEL", SESSION_DIR / "web_analysis.xlsx"))
 timestamp = pd.Timestamp.now().strftime("%Y%m%d_%H%M%S")
 OUTPUT_EXCEL = Path(os.getenv("OUTPUT_EXCEL", SESSION_DIR / f"merged_final_{timestamp}.xlsx"))
 
+# group merges go to worker processes above this many groups
+MERGE_PROCESS_MIN = int(os.getenv("MERGE_PROCESS_MIN", "2000"))
+MERGE_CHUNK = int(os.getenv("MERGE_CHUNK", "512"))
+
 print("\n" + "="*70)
 print("json + excel merger - flexible mode")
 print("="*70)
@@ -43,12 +88,76 @@ FIELD_MAPPING = {
     'notes': 'Notes',
 }
 
+# raw fields that never become columns
+_SKIP_KEYS = frozenset({'ocr_text', 'qr_links'})
+
+
+# compiled patterns
+_PERSIAN_RX = re.compile(r"[\u0600-\u06FF]")
+_SCHEME_RX = re.compile(r"^https?://")
+_WWW_RX = re.compile(r"^www\.")
+_NON_PHONE_RX = re.compile(r"[^\d+]")
+_PUNCT_RX = re.compile(r"[^\w\s]")
+_WS_RX = re.compile(r"\s+")
+_COMPANY_STOPWORDS = ["شرکت", "company", "co.", "co", "ltd", "inc", "corp",
+                      "سهامی", "خاص", "عام", "private", "public", "holding",
+                      "international", "بین المللی", "گروه", "group"]
+_JUNK_COL_RX = re.compile("|".join(f"(?:{p})" for p in [
+    r'^Phone\d{2,}$',
+    r'^Services\d+$',
+    r'^CompanyName\d+$',
+    r'^Email\d+$',
+    r'^Address\d+$',
+    r'^ContactName\d+$',
+    r'.*\[2\]$',
+    r'.*\[3\]$',
+    r'.*\[4\]$',
+    r'^Notes$',
+    r'^_source$',
+    r'^Website\d+$',
+]))
+
+# persian -> english digits
+_FA_EN_DIGITS = str.maketrans('۰۱۲۳۴۵۶۷۸۹', '0123456789')
+
 
 # helper functions
+def json_loads(data):
+    return orjson.loads(data) if HAS_ORJSON else json.loads(data)
+
+def iter_json_items(json_path):
+    """items of a top-level json array, streamed with ijson when available"""
+    with open(json_path, "rb") as f:
+        if HAS_IJSON:
+            yield from ijson.items(f, "item", use_float=True)
+            return
+        raw_data = json_loads(f.read())
+    if isinstance(raw_data, list):
+        yield from raw_data
+
+@lru_cache(maxsize=65536)
+def _has_persian(text):
+    return bool(_PERSIAN_RX.search(text))
+
 def is_persian(text):
     if not text or pd.isna(text):
         return False
-    return bool(re.search(r"[\u0600-\u06FF]", str(text)))
+    return _has_persian(str(text))
+
+def first_by_script(values):
+    """first persian and first non-persian value, in one pass"""
+    fa = en = None
+    for v in values:
+        if not v:
+            continue
+        if is_persian(v):
+            if fa is None:
+                fa = str(v)
+        elif en is None:
+            en = str(v)
+        if fa is not None and en is not None:
+            break
+    return fa, en
 
 def merge_url_columns(df):
     """merge url, urls, website into one website column"""
@@ -59,7 +168,7 @@ def merge_url_columns(df):
     
     def get_first_url(row):
         for field in url_fields:
-            if field in row and row[field] and not pd.isna(row[field]) and str(row[field]).strip():
+            if field in row and not pd.isna(row[field]) and str(row[field]).strip():
                 return str(row[field]).strip()
         return ""
     
@@ -73,64 +182,18 @@ def merge_url_columns(df):
     
     return df
 
+@lru_cache(maxsize=1 << 17)
+def _normalize_text(text):
+    return text.strip().lower()
+
 def normalize_value(val):
     if val is None or pd.isna(val):
         return ""
-    return str(val).strip().lower()
-
-def normalize_website(url):
-    if not url or pd.isna(url):
-        return ""
-    u = str(url).strip().lower()
-    u = re.sub(r"^https?://", "", u)
-    u = re.sub(r"^www\.", "", u)
-    u = u.split("/")[0].split("?")[0]
-    return u.rstrip(".")
-
-def normalize_phone(phone):
-    if not phone or pd.isna(phone):
-        return ""
-    return re.sub(r"[^\d+]", "", str(phone))
-
-def normalize_company_name(name):
-    if not name or pd.isna(name):
-        return ""
-    n = str(name).strip().lower()
-    stopwords = ["شرکت", "company", "co.", "co", "ltd", "inc", "corp",
-                 "سهامی", "خاص", "عام", "private", "public", "holding",
-                 "international", "بین المللی", "گروه", "group"]
-    for word in stopwords:
-        n = n.replace(word, " ")
-    n = re.sub(r"[^\w\s]", " ", n)
-    n = re.sub(r"\s+", " ", n).strip()
-    return n
+    return _normalize_text(str(val))
 
 def are_values_same(val1, val2):
     return normalize_value(val1) == normalize_value(val2)
 
-def extract_key_identifier(record):
-    """extract unique identifier for comparing records"""
-    website = normalize_website(record.get("Website") or record.get("url", ""))
-    if website:
-        return ("website", website)
-    
-    phone_fields = ["Phone1", "Phone2", "Phone3", "Phone4"]
-    for pf in phone_fields:
-        phone = normalize_phone(record.get(pf, ""))
-        if phone and len(phone) >= 8:
-            return ("phone", phone)
-    
-    email = normalize_value(record.get("Email", ""))
-    if email and "@" in email:
-        return ("email", email)
-    
-    for name_field in ["CompanyNameEN", "CompanyNameFA"]:
-        name = normalize_company_name(record.get(name_field, ""))
-        if name and len(name) > 3:
-            return ("company", name)
-    
-    return ("unique", str(id(record)))
-
 
 # convert json to dataframe
 def json_to_dataframe_smart(json_path):
@@ -142,121 +205,121 @@ def json_to_dataframe_smart(json_path):
         return pd.DataFrame()
     
     try:
-        with open(json_path, "r", encoding="utf-8") as f:
-            raw_data = json.load(f)
-        
-        records = []
+        # column buffers instead of a list of record dicts
+        cols = {}
+        n_rows = 0
         
-        if isinstance(raw_data, list):
-            for file_item in raw_data:
-                if not isinstance(file_item, dict):
+        for file_item in iter_json_items(json_path):
+            if not isinstance(file_item, dict):
+                continue
+            
+            result_data = file_item.get("result")
+            
+            # structure 1: result directly dictionary
+            if isinstance(result_data, dict):
+                page_results = [result_data]
+            # structure 2: result array of pages
+            elif isinstance(result_data, list):
+                page_results = []
+                for page_data in result_data:
+                    if isinstance(page_data, dict):
+                        page_results.append(page_data.get("result", {}))
+            else:
+                continue
+            
+            for page_result in page_results:
+                if not isinstance(page_result, dict) or not page_result:
                     continue
                 
-                result_data = file_item.get("result")
+                record = {}
                 
-                # structure 1: result directly dictionary
-                if isinstance(result_data, dict):
-                    page_results = [result_data]
-                # structure 2: result array of pages
-                elif isinstance(result_data, list):
-                    page_results = []
-                    for page_data in result_data:
-                        if isinstance(page_data, dict):
-                            page_results.append(page_data.get("result", {}))
-                else:
-                    continue
-                
-                for page_result in page_results:
-                    if not isinstance(page_result, dict) or not page_result:
+                # process all fields
+                for key, value in page_result.items():
+                    if key in _SKIP_KEYS:
                         continue
+                    col_name = FIELD_MAPPING.get(key, key)
                     
-                    record = {}
-                    
-                    # process all fields
-                    for key, value in page_result.items():
-                        if key in ['ocr_text', 'qr_links']:
+                    if isinstance(value, list):
+                        if not value:
                             continue
                         
-                        if isinstance(value, list):
-                            if not value:
-                                continue
-                            
-                            if value[0] is not None:
-                                col_name = FIELD_MAPPING.get(key, key)
-                                record[col_name] = str(value[0])
-                            
-                            for idx, item in enumerate(value[1:], 2):
-                                if item is not None:
-                                    col_name = FIELD_MAPPING.get(key, key)
-                                    record[f"{col_name}{idx}"] = str(item)
+                        if value[0] is not None:
+                            record[col_name] = str(value[0])
                         
-                        elif isinstance(value, dict):
-                            for sub_key, sub_val in value.items():
-                                if sub_val:
-                                    record[f"{key}_{sub_key}"] = str(sub_val)
-                        
-                        elif value is not None and str(value).strip():
-                            col_name = FIELD_MAPPING.get(key, key)
-                            record[col_name] = str(value)
+                        for idx, item in enumerate(value[1:], 2):
+                            if item is not None:
+                                record[f"{col_name}{idx}"] = str(item)
                     
-                    # process company_names
-                    if 'company_names' in page_result and isinstance(page_result['company_names'], list):
-                        names = page_result['company_names']
-                        fa_names = [str(n) for n in names if n and is_persian(n)]
-                        en_names = [str(n) for n in names if n and not is_persian(n)]
-                        
-                        if fa_names:
-                            record['CompanyNameFA'] = fa_names[0]
-                        if en_names:
-                            record['CompanyNameEN'] = en_names[0]
-                        
-                        record.pop('CompanyName', None)
+                    elif isinstance(value, dict):
+                        for sub_key, sub_val in value.items():
+                            if sub_val:
+                                record[f"{key}_{sub_key}"] = str(sub_val)
                     
-                    # process addresses
-                    if 'addresses' in page_result and isinstance(page_result['addresses'], list):
-                        addresses = page_result['addresses']
-                        fa_addrs = [str(a) for a in addresses if a and is_persian(a)]
-                        en_addrs = [str(a) for a in addresses if a and not is_persian(a)]
-                        
-                        if fa_addrs:
-                            record['AddressFA'] = fa_addrs[0]
-                        if en_addrs:
-                            record['AddressEN'] = en_addrs[0]
-                        
-                        record.pop('Address', None)
+                    elif value is not None and str(value).strip():
+                        record[col_name] = str(value)
+                
+                # process company_names
+                if 'company_names' in page_result and isinstance(page_result['company_names'], list):
+                    names = page_result['company_names']
+                    fa_name, en_name = first_by_script(names)
                     
-                    # process phones
-                    if 'phones' in page_result and isinstance(page_result['phones'], list):
-                        for idx, phone in enumerate(page_result['phones'], 1):
-                            if phone:
-                                record[f'Phone{idx}'] = str(phone)
+                    if fa_name:
+                        record['CompanyNameFA'] = fa_name
+                    if en_name:
+                        record['CompanyNameEN'] = en_name
                     
-                    # process persons
-                    if 'persons' in page_result and page_result['persons']:
-                        if isinstance(page_result['persons'], list):
-                            for idx, person in enumerate(page_result['persons'], 1):
-                                if isinstance(person, dict):
-                                    name = person.get('name', '')
-                                    position = person.get('position', '')
-                                    
-                                    if name:
-                                        record[f'ContactName{idx if idx > 1 else ""}'] = name
-                                    
-                                    if position:
-                                        if is_persian(position):
-                                            record[f'PositionFA{idx if idx > 1 else ""}'] = position
-                                        else:
-                                            record[f'PositionEN{idx if idx > 1 else ""}'] = position
+                    record.pop('CompanyName', None)
+                
+                # process addresses
+                if 'addresses' in page_result and isinstance(page_result['addresses'], list):
+                    addresses = page_result['addresses']
+                    fa_addr, en_addr = first_by_script(addresses)
                     
-                    if record:
-                        records.append(record)
-        
-        if not records:
+                    if fa_addr:
+                        record['AddressFA'] = fa_addr
+                    if en_addr:
+                        record['AddressEN'] = en_addr
+                    
+                    record.pop('Address', None)
+                
+                # process phones
+                if 'phones' in page_result and isinstance(page_result['phones'], list):
+                    for idx, phone in enumerate(page_result['phones'], 1):
+                        if phone:
+                            record[f'Phone{idx}'] = str(phone)
+                
+                # process persons
+                if 'persons' in page_result and page_result['persons']:
+                    if isinstance(page_result['persons'], list):
+                        for idx, person in enumerate(page_result['persons'], 1):
+                            if isinstance(person, dict):
+                                name = person.get('name', '')
+                                position = person.get('position', '')
+                                
+                                if name:
+                                    record[f'ContactName{idx if idx > 1 else ""}'] = name
+                                
+                                if position:
+                                    if is_persian(position):
+                                        record[f'PositionFA{idx if idx > 1 else ""}'] = position
+                                    else:
+                                        record[f'PositionEN{idx if idx > 1 else ""}'] = position
+                
+                if record:
+                    for key, value in record.items():
+                        col = cols.setdefault(key, [])
+                        col.extend([None] * (n_rows - len(col)))
+                        col.append(value)
+                    n_rows += 1
+    
+        if not n_rows:
             print("    no records in json")
             return pd.DataFrame()
         
-        df = pd.DataFrame(records)
-        df = merge_url_columns(df)
+        for col in cols.values():
+            col.extend([None] * (n_rows - len(col)))
+        # url columns are merged once, on the final frame
+        df = pd.DataFrame(cols, dtype=STRING_DTYPE)
         
         print(f"    json: {len(df)} rows x {len(df.columns)} columns")
         return df
@@ -278,7 +341,15 @@ def load_excel_dataframe(excel_path):
         return pd.DataFrame()
     
     try:
-        df = pd.read_excel(excel_path)
+        # all text: skip type inference, empty cells stay ''
+        read_opts = dict(dtype=STRING_DTYPE, keep_default_na=False, na_filter=False)
+        try:
+            df = pd.read_excel(excel_path, engine=EXCEL_READ_ENGINE, **read_opts)
+        except ValueError:
+            if EXCEL_READ_ENGINE == 'openpyxl':
+                raise
+            # engine not supported by this pandas/calamine pair
+            df = pd.read_excel(excel_path, engine='openpyxl', **read_opts)
         print(f"    size: {df.shape[0]} rows x {df.shape[1]} columns")
         
         if df.empty:
@@ -299,9 +370,13 @@ def load_excel_dataframe(excel_path):
         
         # cleanup
         df = df.loc[:, ~df.columns.duplicated()]
-        df = df.dropna(how='all', axis=0)
-        df = df.dropna(how='all', axis=1)
-        df = df.drop_duplicates()
+        # empty cells are '' (no nan), one mask for all-empty rows and columns
+        filled = df.ne('').to_numpy(dtype=bool)
+        row_ok, col_ok = filled.any(axis=1), filled.any(axis=0)
+        if not (row_ok.all() and col_ok.all()):
+            df = df.loc[row_ok, col_ok]
+        # one hash per row instead of tuple compare
+        df = df[~pd.util.hash_pandas_object(df, index=False).duplicated()]
         df.columns = [str(col).strip() for col in df.columns]
         
         # remove extra columns
@@ -318,35 +393,108 @@ def load_excel_dataframe(excel_path):
         return pd.DataFrame()
 
 
+def key_series(df, tag):
+    """
+    record identifier for every row at once, as 'type:value' strings;
+    first match wins: website, phone (8+ digits), email, company name, else unique
+    """
+    n = len(df)
+    
+    def text(name):
+        # str() of each cell, '' for missing cells / columns
+        if name not in df.columns:
+            return pd.Series([""] * n, index=df.index, dtype=object)
+        s = df[name].astype(object)
+        return s.where(s.notna(), "").astype(str)
+    
+    website = text("Website")
+    website = website.where(website != "", text("url"))
+    website = (website.str.strip().str.lower()
+               .str.replace(_SCHEME_RX, "", regex=True)
+               .str.replace(_WWW_RX, "", regex=True)
+               .str.split("/").str[0].str.split("?").str[0]
+               .str.rstrip("."))
+    candidates = [("website", website, website != "")]
+    
+    for pf in ["Phone1", "Phone2", "Phone3", "Phone4"]:
+        phone = text(pf).str.replace(_NON_PHONE_RX, "", regex=True)
+        candidates.append(("phone", phone, phone.str.len() >= 8))
+    
+    email = text("Email").str.strip().str.lower()
+    candidates.append(("email", email, (email != "") & email.str.contains("@", regex=False)))
+    
+    for name_field in ["CompanyNameEN", "CompanyNameFA"]:
+        name = text(name_field).str.strip().str.lower()
+        # sequential on purpose, one alternation regex would match differently
+        for word in _COMPANY_STOPWORDS:
+            name = name.str.replace(word, " ", regex=False)
+        name = (name.str.replace(_PUNCT_RX, " ", regex=True)
+                .str.replace(_WS_RX, " ", regex=True)
+                .str.strip())
+        candidates.append(("company", name, name.str.len() > 3))
+    
+    # lowest priority first, so earlier identifiers overwrite later ones
+    key = np.array([f"unique:{tag}{i}" for i in range(n)], dtype=object)
+    for kt, val, ok in reversed(candidates):
+        key = np.where(ok.to_numpy(), (kt + ":" + val).to_numpy(dtype=object), key)
+    return key
+
+
 # merge two records
-def merge_two_records(r1, r2):
-    """merge two records - r1 has priority"""
-    merged = {}
-    for key in set(r1.keys()) | set(r2.keys()):
-        v1, v2 = r1.get(key), r2.get(key)
-        
-        if not v1 and not v2:
+def merge_two_records(r1, r2, next_slot=None):
+    """merge two records - r1 has priority; next_slot carries [n] counters across merges"""
+    merged = {k: v for k, v in r1.items() if v}
+    if next_slot is None:
+        next_slot = {}
+    
+    for key, v2 in r2.items():
+        if not v2:
             continue
-        if not v1:
+        if key not in merged:
             merged[key] = v2
             continue
-        if not v2:
-            merged[key] = v1
-            continue
         
-        if are_values_same(v1, v2):
-            merged[key] = v1
-        else:
+        if not are_values_same(merged[key], v2):
             # if values differ, keep both
-            merged[key] = v1
-            counter = 2
+            counter = next_slot.get(key, 2)
             while f"{key}[{counter}]" in merged:
                 counter += 1
             merged[f"{key}[{counter}]"] = v2
+            next_slot[key] = counter + 1
     
     return merged
 
 
+def _merge_group(base, others):
+    # one counter dict per group, so later records don't re-probe used [n] slots
+    next_slot = {}
+    for rec in others:
+        base = merge_two_records(base, rec, next_slot)
+    return base
+
+def _merge_chunk(chunk):
+    """merge a list of (base, others) groups"""
+    return [_merge_group(base, others) for base, others in chunk]
+
+def merge_groups(jobs):
+    """merge every (base, others) group, in a process pool when there are many"""
+    if len(jobs) < MERGE_PROCESS_MIN:
+        return _merge_chunk(jobs)
+    
+    chunks = [jobs[i:i + MERGE_CHUNK] for i in range(0, len(jobs), MERGE_CHUNK)]
+    try:
+        with ProcessPoolExecutor() as ex:
+            return list(chain.from_iterable(ex.map(_merge_chunk, chunks)))
+    except Exception as e:
+        print(f"    process pool failed ({e}), merging in-process")
+        return _merge_chunk(jobs)
+
+
+def frame_records(df):
+    """rows as dicts, missing cells (nan / pd.NA) as None"""
+    return df.astype(object).where(df.notna(), None).to_dict('records')
+
+
 # smart dataframe merge
 def smart_merge_dataframes(json_df, excel_df):
     """smart merge of two dataframes"""
@@ -363,66 +511,72 @@ def smart_merge_dataframes(json_df, excel_df):
     
     if excel_df.empty:
         print("    using json only")
-        return json_df
-    
-    # convert to records
-    json_records = json_df.to_dict('records')
-    excel_records = excel_df.to_dict('records')
-    
-    # group by identifier
-    groups = defaultdict(list)
+        return merge_url_columns(json_df)
     
-    for rec in json_records:
-        rec['_source'] = 'JSON'
-        kt, kv = extract_key_identifier(rec)
-        groups[f"{kt}:{kv}"].append(rec)
-    
-    for rec in excel_records:
-        rec['_source'] = 'Excel'
-        kt, kv = extract_key_identifier(rec)
-        groups[f"{kt}:{kv}"].append(rec)
+    # group by identifier: keys for all rows at once, codes follow first appearance
+    json_keys = key_series(json_df, "json")
+    excel_keys = key_series(excel_df, "excel")
+    codes, uniques = pd.factorize(np.concatenate([json_keys, excel_keys]))
+    n_json = len(json_keys)
+    sizes = np.bincount(codes, minlength=len(uniques))
     
     # stats
-    json_only = sum(1 for g in groups.values() if len(g)==1 and g[0]['_source']=='JSON')
-    excel_only = sum(1 for g in groups.values() if len(g)==1 and g[0]['_source']=='Excel')
-    merged = sum(1 for g in groups.values() if len(g)>1)
+    single = sizes[codes] == 1
+    json_only = int(single[:n_json].sum())
+    excel_only = int(single[n_json:].sum())
+    merged = int((sizes > 1).sum())
     
-    print(f"    groups: {len(groups)}")
+    print(f"    groups: {len(uniques)}")
     print(f"       json only: {json_only}")
     print(f"       excel only: {excel_only}")
     print(f"       merged: {merged}")
     
-    # merge
-    final_records = []
-    for gk, grecs in groups.items():
-        if len(grecs) == 1:
-            rec = grecs[0].copy()
-            rec.pop('_source', None)
-            final_records.append(rec)
+    # merge - singletons pass through as rows, only real groups become dicts
+    members = defaultdict(list)
+    for pos in np.flatnonzero(sizes[codes] > 1):
+        members[codes[pos]].append(pos)
+    
+    keep_json, keep_excel, merge_jobs = [], [], []
+    order_json, order_excel, order_merged = [], [], []
+    for pos in np.flatnonzero(single):
+        if pos < n_json:
+            keep_json.append(pos)
+            order_json.append(codes[pos])
         else:
-            # multi-merge - excel has priority
-            excel_recs = [r for r in grecs if r.get('_source') == 'Excel']
-            json_recs = [r for r in grecs if r.get('_source') == 'JSON']
-            
-            # if we have excel, start from it
-            if excel_recs:
-                base = excel_recs[0].copy()
-                base.pop('_source', None)
-                
-                # merge json records
-                for jr in json_recs:
-                    jc = jr.copy()
-                    jc.pop('_source', None)
-                    base = merge_two_records(base, jc)
-                
-                final_records.append(base)
-            else:
-                # only json
-                base = json_recs[0].copy()
-                base.pop('_source', None)
-                final_records.append(base)
+            keep_excel.append(pos - n_json)
+            order_excel.append(codes[pos])
     
-    result_df = pd.DataFrame(final_records)
+    groups = []
+    for code, positions in members.items():
+        excel_pos = [p - n_json for p in positions if p >= n_json]
+        json_pos = [p for p in positions if p < n_json]
+        
+        if excel_pos:
+            # multi-merge - excel has priority, start from it
+            groups.append((code, excel_pos[0], json_pos))
+        else:
+            # only json
+            keep_json.append(json_pos[0])
+            order_json.append(code)
+    
+    # one dict conversion per frame, only for rows that take part in a merge
+    excel_need = sorted({e for _, e, _ in groups})
+    json_need = sorted({j for _, _, js in groups for j in js})
+    excel_recs = dict(zip(excel_need, frame_records(excel_df.iloc[excel_need])))
+    json_recs = dict(zip(json_need, frame_records(json_df.iloc[json_need])))
+    for code, e, js in groups:
+        merge_jobs.append((excel_recs[e], [json_recs[j] for j in js]))
+        order_merged.append(code)
+    
+    merged_recs = merge_groups(merge_jobs)
+    parts = [json_df.iloc[keep_json], excel_df.iloc[keep_excel]]
+    if merged_recs:
+        parts.append(pd.DataFrame(merged_recs))
+    result_df = pd.concat(parts, ignore_index=True, sort=False)
+    
+    # rows in group order, as before
+    order = np.argsort(np.concatenate([order_json, order_excel, order_merged]), kind='stable')
+    result_df = result_df.iloc[order].reset_index(drop=True)
     result_df = merge_url_columns(result_df)
     
     print(f"    final: {len(result_df)} rows x {len(result_df.columns)} columns")
@@ -438,31 +592,8 @@ def remove_junk_columns(df):
     if df.empty:
         return df
     
-    # columns to remove
-    junk_patterns = [
-        r'^Phone\d{2,}$',
-        r'^Services\d+$',
-        r'^CompanyName\d+$',
-        r'^Email\d+$',
-        r'^Address\d+$',
-        r'^ContactName\d+$',
-        r'.*\[2\]$',
-        r'.*\[3\]$',
-        r'.*\[4\]$',
-        r'^Notes$',
-        r'^_source$',
-        r'^Website\d+$',
-    ]
-    
-    cols_to_drop = []
-    for col in df.columns:
-        for pattern in junk_patterns:
-            if re.match(pattern, str(col)):
-                cols_to_drop.append(col)
-                break
-    
-    # remove duplicates
-    cols_to_drop = list(set(cols_to_drop))
+    # columns to remove (patterns in _JUNK_COL_RX), each name once
+    cols_to_drop = [col for col in df.columns.unique() if _JUNK_COL_RX.match(str(col))]
     
     if cols_to_drop:
         df = df.drop(columns=cols_to_drop, errors='ignore')
@@ -474,6 +605,34 @@ def remove_junk_columns(df):
 
 
 # save
+def fast_to_excel(df, path):
+    """stream dataframe rows to xlsx (xlsxwriter constant_memory, else openpyxl write-only)"""
+    # nan cells would be written as invalid numbers
+    values = df.astype(object).where(df.notna(), None)
+    
+    if HAS_XLSXWRITER:
+        # cell text is written as-is: no formula, url or number guessing
+        wb = xlsxwriter.Workbook(str(path), {
+            'constant_memory': True,
+            'strings_to_formulas': False,
+            'strings_to_urls': False,
+            'strings_to_numbers': False,
+        })
+        ws = wb.add_worksheet("Sheet1")
+        ws.write_row(0, 0, [str(c) for c in df.columns])
+        for r, row in enumerate(values.itertuples(index=False, name=None), 1):
+            ws.write_row(r, 0, row)
+        wb.close()
+        return
+    
+    wb = Workbook(write_only=True)
+    ws = wb.create_sheet("Sheet1")
+    ws.append([str(c) for c in df.columns])
+    for row in values.itertuples(index=False, name=None):
+        ws.append(row)
+    wb.save(path)
+
+
 def save_excel(df, path):
     """save dataframe to excel with cleanup"""
     if df.empty:
@@ -486,27 +645,19 @@ def save_excel(df, path):
         # extra cleanup
         def clean_dataframe_before_excel(df):
             """remove formulas and errors"""
-            import numpy as np
-            
-            for col in df.columns:
-                if df[col].dtype == 'object':
-                    # 1. remove excel formulas
-                    df[col] = df[col].apply(
-                        lambda x: str(x)[1:] if isinstance(x, str) and str(x).startswith('=') else x
-                    )
-                    
-                    # 2. remove errors
-                    df[col] = df[col].apply(
-                        lambda x: "" if isinstance(x, str) and str(x).startswith('#') else x
-                    )
-                    
-                    # 3. convert persian digits
-                    persian_digits = '۰۱۲۳۴۵۶۷۸۹'
-                    english_digits = '0123456789'
-                    trans_table = str.maketrans(persian_digits, english_digits)
-                    df[col] = df[col].apply(
-                        lambda x: str(x).translate(trans_table) if isinstance(x, str) else x
-                    )
+            for col in df.select_dtypes(include=['object', 'string']).columns:
+                s = df[col]
+                # .str yields nan for non-string cells, those are restored below
+                # 1. remove excel formulas
+                try:
+                    txt = s.str.removeprefix('=')
+                except AttributeError:
+                    continue  # no string cells in this column
+                # 2. remove errors
+                txt = txt.mask(txt.str.startswith('#', na=False), "")
+                # 3. convert persian digits
+                txt = txt.str.translate(_FA_EN_DIGITS)
+                df[col] = txt.where(txt.notna(), s)
             
             return df
         
@@ -514,7 +665,7 @@ def save_excel(df, path):
         print(f"   cleaned {len(df.columns)} columns")
         
         df = df.fillna("")
-        df.to_excel(path, index=False, engine='openpyxl')
+        fast_to_excel(df, path)
         print(f"    saved: {path}")
         print(f"    {len(df)} rows x {len(df.columns)} columns")
         return True
@@ -554,7 +705,7 @@ def main():
         print(f"json loaded: {len(json_df)} rows x {len(json_df.columns)} columns")
         
         # remove junk columns
-        final_df = remove_junk_columns(json_df)
+        final_df = remove_junk_columns(merge_url_columns(json_df))
         
         # save directly
         if save_excel(final_df, OUTPUT_EXCEL):
@@ -602,8 +753,11 @@ def main():
     # mode 4: both exist (merge)
     print("both json and excel found - merging...")
     
-    json_df = json_to_dataframe_smart(INPUT_JSON)
-    excel_df = load_excel_dataframe(INPUT_EXCEL)
+    # independent loads, read and parse side by side
+    with ThreadPoolExecutor(2) as ex:
+        json_future = ex.submit(json_to_dataframe_smart, INPUT_JSON)
+        excel_future = ex.submit(load_excel_dataframe, INPUT_EXCEL)
+        json_df, excel_df = json_future.result(), excel_future.result()
     
     if json_df.empty and excel_df.empty:
         print("error: both sources are empty!")
@@ -3,6 +3,12 @@ from pathlib import Path
 import os
 import json
 
+try:
+    import orjson
+    HAS_ORJSON = True
+except ImportError:
+    HAS_ORJSON = False
+
 # =========================================================
 # 🧩 مسیرهای پویا
 SESSION_DIR = Path(os.getenv("SESSION_DIR", Path.cwd()))
@@ -26,6 +32,18 @@ def read_json(path: Path):
         print(f"❌ Error reading {path}: {e}")
         return []
 
+def write_json_stream(path: Path, items):
+    """نوشتن تدریجی آرایه JSON (هر آیتم جدا) بدون ساخت یک رشته‌ی بزرگ"""
+    with open(path, "wb") as f:
+        f.write(b"[\n")
+        for i, obj in enumerate(items):
+            if HAS_ORJSON:
+                chunk = orjson.dumps(obj, option=orjson.OPT_INDENT_2)
+            else:
+                chunk = json.dumps(obj, ensure_ascii=False, indent=2).encode("utf-8")
+            f.write((b",\n" if i else b"") + chunk)
+        f.write(b"\n]\n")
+
 def merge_single_image(item, qr_result):
     """ادغام داده‌های تصویر"""
     qr_links = [p.get("qr_link") for p in qr_result if p.get("qr_link")]
@@ -46,6 +64,18 @@ def merge_pdf_pages(item, qr_result):
         page_obj["qr_link"] = qr_match
     return item
 
+def merge_other(item, qr_result):
+    """سایر فرمت‌ها: بدون لینک QR"""
+    item["result"] = item.get("result", {})
+    item["result"]["qr_links"] = None
+    return item
+
+# 🗂 انتخاب تابع ادغام بر اساس پسوند فایل
+MERGE_BY_EXT = {
+    **{ext: merge_single_image for ext in ("jpg", "jpeg", "png", "webp", "bmp")},
+    "pdf": merge_pdf_pages,
+}
+
 def merge_ocr_qr(ocr_data, qr_data):
     """ادغام کامل داده‌های OCR و QR"""
     qr_lookup = {item["file_name"]: item.get("result", []) for item in qr_data}
@@ -55,20 +85,9 @@ def merge_ocr_qr(ocr_data, qr_data):
         file_name = item.get("file_name")
         qr_result = qr_lookup.get(file_name, [])
 
-        # 🖼 حالت تصویر
-        if file_name.lower().endswith((".jpg", ".jpeg", ".png", ".webp", ".bmp")):
-            item = merge_single_image(item, qr_result)
-
-        # 📄 حالت PDF
-        elif file_name.lower().endswith(".pdf"):
-            item = merge_pdf_pages(item, qr_result)
-
-        # 🧩 سایر فرمت‌ها
-        else:
-            item["result"] = item.get("result", {})
-            item["result"]["qr_links"] = None
-
-        merged.append(item)
+        ext = file_name.lower().rpartition(".")[2]
+        handler = MERGE_BY_EXT.get(ext, merge_other)
+        merged.append(handler(item, qr_result))
 
     return merged
 
@@ -91,7 +110,7 @@ def main():
 
     merged_results = merge_ocr_qr(ocr_data, qr_data)
 
-    OUTPUT_FILE.write_text(json.dumps(merged_results, ensure_ascii=False, indent=2), encoding="utf-8")
+    write_json_stream(OUTPUT_FILE, merged_results)
 
     print(f"\n✅ Merge completed successfully!")
     print(f"📁 Final output saved to → {OUTPUT_FILE}")
@@ -1,16 +1,26 @@
 # -*- coding: utf-8 -*-
 from __future__ import annotations
 from pathlib import Path
-import os, sys, json, time, io
-from typing import Any, Dict, List, Union
+import os, sys, json, time, io, tempfile, hashlib, asyncio, random
+from typing import Any, Dict, Iterator, List, Tuple, Union
 from PIL import Image
 from concurrent.futures import ThreadPoolExecutor, as_completed
 import threading
+from collections import deque
+from functools import lru_cache
+
+try:
+    import orjson
+    HAS_ORJSON = True
+except ImportError:
+    HAS_ORJSON = False
 
 # gemini sdk import
 try:
     import google.genai as _genai_new
     from google.genai import types as _genai_types
+    from google.genai import errors as _genai_errors
+    import httpx
     print("gemini sdk loaded successfully (google-genai).")
 except Exception as e:
     print("gemini sdk failed to load:", e)
@@ -21,6 +31,7 @@ except Exception as e:
 SESSION_DIR = Path(os.getenv("SESSION_DIR", Path.cwd()))
 SOURCE_FOLDER = Path(os.getenv("SOURCE_FOLDER", SESSION_DIR / "uploads"))
 OUT_JSON = Path(os.getenv("OUT_JSON", SESSION_DIR / "gemini_output.json"))
+CHECKPOINT_JSONL = OUT_JSON.with_suffix(".jsonl")   # per-file progress, removed after a full run
 
 # poppler path for pdf -> image
 POPPLER_PATH = os.getenv("POPPLER_PATH", r"C:\poppler\Library\bin")
@@ -31,6 +42,8 @@ os.environ["PATH"] += os.pathsep + POPPLER_PATH
 MODEL_NAME = "gemini-2.5-flash"
 TEMPERATURE = 0.0
 PDF_IMG_DPI = 150
+PDF_RENDER_CHUNK = 8                          # pages rasterized per pdftoppm call
+PDF_RENDER_THREADS = min(os.cpu_count() or 1, 8)
 BATCH_SIZE_PDF = 1
 BATCH_SIZE_IMAGES = 3
 
@@ -38,11 +51,87 @@ MAX_IMAGES = 30      # max 30 images
 MAX_PDF = 10         # max 10 pdfs
 MAX_EXCEL = 5        # max 5 excel 
 MAX_WORKERS = 3      # number of parallel threads
+GEMINI_MAX_SIDE = int(os.getenv("GEMINI_MAX_SIDE", "2000"))  # long side cap before upload (gemini tiles internally)
+JPEG_QUALITY = int(os.getenv("JPEG_QUALITY", "92"))
+JPEG_SUBSAMPLING = int(os.getenv("JPEG_SUBSAMPLING", "0"))  # 0 = 4:4:4, keeps thin strokes sharp
+FILE_API_THRESHOLD = 2_000_000   # larger images go through the file api instead of inline base64
+PDF_PAGES_PER_REQUEST = int(os.getenv("PDF_PAGES_PER_REQUEST", "4"))  # pdf pages packed into one gemini call
+GEMINI_RPM = int(os.getenv("GEMINI_RPM", "60"))  # requests per minute (0 = no limit)
 
 
 # api key setup 
 API_KEY = "AI***xY"
-CLIENT = _genai_new.Client(api_key=API_KEY)
+# keep-alive pool so worker threads reuse tcp/tls connections
+HTTP_LIMITS = dict(max_keepalive_connections=16, max_connections=32, keepalive_expiry=60)
+CLIENT = _genai_new.Client(
+    api_key=API_KEY,
+    http_options=_genai_types.HttpOptions(
+        client_args={"limits": httpx.Limits(**HTTP_LIMITS)},
+        async_client_args={"limits": httpx.Limits(**HTTP_LIMITS)},
+    ),
+)
+CONNECTION_RETRIES = 2   # retries when a pooled connection was closed by the server
+RATE_LIMIT_RETRIES = int(os.getenv("RATE_LIMIT_RETRIES", "5"))  # retries after a 429
+BACKOFF_MAX = 60         # seconds, cap for one 429 backoff
+
+
+# token bucket shared by all threads (replaces fixed sleeps between calls)
+class RateLimiter:
+    def __init__(self, rpm: int, burst: int):
+        self.rate = rpm / 60.0
+        self.capacity = float(max(1, burst))
+        self.tokens = self.capacity
+        self.updated = time.monotonic()
+        self.lock = threading.Lock()
+
+    def acquire(self):
+        if self.rate <= 0:
+            return
+        while True:
+            with self.lock:
+                now = time.monotonic()
+                self.tokens = min(self.capacity, self.tokens + (now - self.updated) * self.rate)
+                self.updated = now
+                if self.tokens >= 1:
+                    self.tokens -= 1
+                    return
+                wait = (1 - self.tokens) / self.rate
+            time.sleep(wait)
+
+RATE_LIMITER = RateLimiter(GEMINI_RPM, burst=MAX_WORKERS)
+
+
+# same bucket for coroutines: waiting yields to the event loop instead of blocking a thread
+class AsyncTokenBucket:
+    def __init__(self, rpm: int, burst: int):
+        self.rate = rpm / 60.0
+        self.capacity = float(max(1, burst))
+        self.tokens = self.capacity
+        self.updated = time.monotonic()
+        self.lock = asyncio.Lock()
+
+    async def acquire(self):
+        if self.rate <= 0:
+            return
+        async with self.lock:  # waiters are served in order
+            while True:
+                now = time.monotonic()
+                self.tokens = min(self.capacity, self.tokens + (now - self.updated) * self.rate)
+                self.updated = now
+                if self.tokens >= 1:
+                    self.tokens -= 1
+                    return
+                await asyncio.sleep((1 - self.tokens) / self.rate)
+
+ASYNC_RATE_LIMITER = AsyncTokenBucket(GEMINI_RPM, burst=GEMINI_RPM // 10)
+
+
+# exponential backoff with jitter after a 429
+def is_rate_limited(e: Exception) -> bool:
+    return isinstance(e, _genai_errors.APIError) and getattr(e, "code", None) == 429
+
+def backoff_delay(attempt: int) -> float:
+    return min(BACKOFF_MAX, 2 ** attempt + random.random())
 
 
 # gemini prompt
@@ -52,9 +141,14 @@ return only valid json matching the schema. keep original persian text exactly a
 if a field has no value, return null.
 """
 
+JSON_INSTRUCTIONS_BATCH = JSON_INSTRUCTIONS + """
+the request contains several page images. return a json array with one object per image, in the same order as the images.
+"""
+
 
 
 # define json output structure
+@lru_cache(maxsize=1)
 def build_newsdk_schema():
     P = _genai_types
     return P.Schema(
@@ -84,78 +178,324 @@ def build_newsdk_schema():
         required=["ocr_text"]
     )
 
+@lru_cache(maxsize=1)
+def build_batch_schema():
+    P = _genai_types
+    return P.Schema(type=P.Type.ARRAY, items=build_newsdk_schema())
+
 
-# helper functions
-def list_files(path: Union[str, Path]) -> List[Path]:
-    exts = {".jpg", ".jpeg", ".png", ".pdf"}
-    return sorted([f for f in Path(path).rglob("*") if f.suffix.lower() in exts])
+def build_config(schema):
+    return _genai_types.GenerateContentConfig(
+        temperature=TEMPERATURE,
+        response_mime_type="application/json",
+        response_schema=schema,
+    )
+
+# built once, shared by every call
+_SCHEMA = build_newsdk_schema()
+_CFG = build_config(_SCHEMA)
+_BATCH_CFG = build_config(build_batch_schema())
 
-def to_pil(image_path: Path) -> Image.Image:
-    return Image.open(image_path).convert("RGB")
+
+# helper functions
+def json_loads(txt: str) -> Any:
+    return orjson.loads(txt) if HAS_ORJSON else json.loads(txt)
+
+def json_dump_bytes(obj: Any) -> bytes:
+    if HAS_ORJSON:
+        return orjson.dumps(obj, option=orjson.OPT_INDENT_2 | orjson.OPT_NON_STR_KEYS)
+    return json.dumps(obj, ensure_ascii=False, indent=2).encode("utf-8")
+
+
+def _incomplete(entry: Dict[str, Any]) -> bool:
+    # a failed file, or a pdf with at least one failed page
+    if "error" in entry:
+        return True
+    res = entry.get("result")
+    return isinstance(res, list) and any(isinstance(p, dict) and "error" in p for p in res)
+
+
+# append-only jsonl of finished files, lets an interrupted run resume without re-billing.
+# keyed by full path, the source walk is recursive and file names repeat across subfolders
+class Checkpoint:
+    def __init__(self, path: Path):
+        self.path = path
+        self.done: Dict[str, Dict[str, Any]] = {}
+        if path.exists():
+            for line in path.read_bytes().splitlines():
+                try:
+                    entry = json_loads(line)
+                except Exception:
+                    continue  # torn last line after a crash
+                key = entry.pop("path", None)
+                if key is None:
+                    continue  # written by an older run, not safe to match by name
+                if _incomplete(entry):
+                    self.done.pop(key, None)  # retried on this run
+                else:
+                    self.done[key] = entry
+            print(f"resuming: {len(self.done)} file(s) already processed in {path.name}")
+        self.lock = threading.Lock()
+        self.file = open(path, "ab")
+
+    def write(self, path: Path, entry: Dict[str, Any]):
+        entry = {"path": str(path), **entry}
+        if HAS_ORJSON:
+            line = orjson.dumps(entry, option=orjson.OPT_NON_STR_KEYS)
+        else:
+            line = json.dumps(entry, ensure_ascii=False).encode("utf-8")
+        with self.lock:
+            self.file.write(line + b"\n")
+            self.file.flush()
+
+    def close(self, remove: bool = False):
+        self.file.close()
+        if remove:
+            self.path.unlink(missing_ok=True)
+
+_IMG_EXT = frozenset({"jpg", "jpeg", "png"})
+
+def list_and_split(path: Union[str, Path]) -> Tuple[List[Path], List[Path]]:
+    # one recursive scandir walk, split into (images, pdfs)
+    images, pdfs = [], []
+    stack = [str(path)]
+    while stack:
+        with os.scandir(stack.pop()) as it:
+            for entry in it:
+                if entry.is_dir(follow_symlinks=False):
+                    stack.append(entry.path)
+                    continue
+                ext = entry.name.rpartition(".")[2].lower()
+                if ext in _IMG_EXT:
+                    images.append(Path(entry.path))
+                elif ext == "pdf":
+                    pdfs.append(Path(entry.path))
+    return sorted(images), sorted(pdfs)
+
+def downscale(img: Image.Image, max_side: int = GEMINI_MAX_SIDE) -> Image.Image:
+    w, h = img.size
+    scale = min(1.0, max_side / max(w, h)) if max_side else 1.0
+    if scale < 1.0:
+        img = img.resize((max(1, int(w * scale)), max(1, int(h * scale))), Image.LANCZOS)
+    return img
+
+def to_pil(image_path: Path, max_side: int = GEMINI_MAX_SIDE) -> Image.Image:
+    img = Image.open(image_path)
+    if max_side:
+        # draft lets the jpeg decoder skip pixels we would throw away anyway
+        img.draft("RGB", (max_side, max_side))
+    return downscale(img.convert("RGB"), max_side)
+
+_NULL_FIELDS = ("addresses","phones","faxes","emails","urls","telegram","instagram","linkedin",
+                "company_names","services","persons")
 
 def ensure_nulls(obj: Dict[str, Any]) -> Dict[str, Any]:
-    fields = ["addresses","phones","faxes","emails","urls","telegram","instagram","linkedin","company_names","services"]
-    for f in fields:
-        if f not in obj or not obj[f]:
+    for f in _NULL_FIELDS:
+        if not obj.get(f):
             obj[f] = None
-    if "persons" not in obj or not obj["persons"]:
-        obj["persons"] = None
-    if "notes" not in obj or obj["notes"] == "":
+    if obj.get("notes") == "":
         obj["notes"] = None
-    if "ocr_text" not in obj or obj["ocr_text"] is None:
+    else:
+        obj.setdefault("notes", None)
+    if obj.get("ocr_text") is None:
         obj["ocr_text"] = ""
     return obj
 
 
-# send function with single key (no rotation)
-def call_gemini_single_key(data: Image.Image, source_path: Path) -> Dict[str, Any]:
-    schema = build_newsdk_schema()
-    cfg = _genai_types.GenerateContentConfig(
-        temperature=TEMPERATURE,
-        response_mime_type="application/json",
-        response_schema=schema,
-    )
-
-    buffer = io.BytesIO()
-    data.save(buffer, format="JPEG", quality=85)
-    image_bytes = buffer.getvalue()
-
-    if len(image_bytes) > 10_000_000:
-        raise RuntimeError(f"image too large ({len(image_bytes)/1_000_000:.1f} mb).")
-
-    parts = [
-        _genai_types.Part(text=JSON_INSTRUCTIONS),
-        _genai_types.Part(inline_data=_genai_types.Blob(mime_type="image/jpeg", data=image_bytes))
-    ]
+# encode image for inline upload (one reusable buffer per worker thread)
+_TLS = threading.local()
+
+def encode_jpeg(data: Image.Image) -> bytes:
+    data = downscale(data)
+    buffer = getattr(_TLS, "buf", None)
+    if buffer is None:
+        buffer = _TLS.buf = io.BytesIO()
+    buffer.seek(0)
+    buffer.truncate(0)
+    data.save(buffer, format="JPEG", quality=JPEG_QUALITY, subsampling=JPEG_SUBSAMPLING,
+              optimize=False, progressive=False)
+    return buffer.getvalue()
+
+# uploaded file uris by content hash, so retries and re-queries reuse the upload
+_UPLOADED: Dict[str, str] = {}
+_UPLOADED_LOCK = threading.Lock()
+
+def upload_image(image_bytes: bytes) -> str:
+    key = hashlib.blake2b(image_bytes, digest_size=16).hexdigest()
+    with _UPLOADED_LOCK:
+        uri = _UPLOADED.get(key)
+    if uri:
+        return uri
+    f = CLIENT.files.upload(file=io.BytesIO(image_bytes), config={"mime_type": "image/jpeg"})
+    with _UPLOADED_LOCK:
+        _UPLOADED[key] = f.uri
+    return f.uri
+
+def image_part(image_bytes: bytes):
+    if len(image_bytes) > FILE_API_THRESHOLD:
+        uri = upload_image(image_bytes)
+        return _genai_types.Part(file_data=_genai_types.FileData(mime_type="image/jpeg", file_uri=uri))
+    return _genai_types.Part(inline_data=_genai_types.Blob(mime_type="image/jpeg", data=image_bytes))
+
+
+# generate_content with retry on stale keep-alive connections and backoff on 429
+def generate(parts: list, cfg):
+    dropped = throttled = 0
+    while True:
+        RATE_LIMITER.acquire()
+        try:
+            return CLIENT.models.generate_content(model=MODEL_NAME, contents=parts, config=cfg)
+        except (httpx.RemoteProtocolError, httpx.ReadError) as e:
+            if dropped == CONNECTION_RETRIES:
+                raise
+            dropped += 1
+            print(f"connection dropped ({e.__class__.__name__}), retrying...")
+        except Exception as e:
+            if not is_rate_limited(e) or throttled == RATE_LIMIT_RETRIES:
+                raise
+            delay = backoff_delay(throttled)
+            throttled += 1
+            print(f"rate limited (429), retrying in {delay:.1f}s...")
+            time.sleep(delay)
+
+
+# same, on the async client (event loop instead of worker threads)
+async def generate_async(parts: list, cfg):
+    dropped = throttled = 0
+    while True:
+        await ASYNC_RATE_LIMITER.acquire()
+        try:
+            return await CLIENT.aio.models.generate_content(model=MODEL_NAME, contents=parts, config=cfg)
+        except (httpx.RemoteProtocolError, httpx.ReadError) as e:
+            if dropped == CONNECTION_RETRIES:
+                raise
+            dropped += 1
+            print(f"connection dropped ({e.__class__.__name__}), retrying...")
+        except Exception as e:
+            if not is_rate_limited(e) or throttled == RATE_LIMIT_RETRIES:
+                raise
+            delay = backoff_delay(throttled)
+            throttled += 1
+            print(f"rate limited (429), retrying in {delay:.1f}s...")
+            await asyncio.sleep(delay)
+
+
+def parse_response(resp) -> Any:
+    txt = getattr(resp, "text", None)
+    if not txt and getattr(resp, "candidates", None):
+        txt = "\n".join(p.text for p in resp.candidates[0].content.parts if getattr(p, "text", None))
+    if not txt:
+        raise RuntimeError("empty response from gemini.")
+    print("gemini response received successfully.")
+    return json_loads(txt)
+
+
+# send parts and parse the json answer
+def send_to_gemini(parts: list, cfg) -> Any:
+    try:
+        return parse_response(generate(parts, cfg))
+    except Exception as e:
+        raise RuntimeError(f"gemini api error: {e}")
 
+async def send_to_gemini_async(parts: list, cfg) -> Any:
     try:
-        resp = CLIENT.models.generate_content(model=MODEL_NAME, contents=parts, config=cfg)
-        txt = getattr(resp, "text", None)
-        if not txt and getattr(resp, "candidates", None):
-            txt = "\n".join(p.text for p in resp.candidates[0].content.parts if getattr(p, "text", None))
-        if not txt:
-            raise RuntimeError("empty response from gemini.")
-        print("gemini response received successfully.")
-        return ensure_nulls(json.loads(txt))
+        return parse_response(await generate_async(parts, cfg))
     except Exception as e:
         raise RuntimeError(f"gemini api error: {e}")
 
 
+# send function with single key (no rotation); encoding / upload run off the event loop
+async def call_gemini_single_key(data: Image.Image, source_path: Path) -> Dict[str, Any]:
+    image_bytes = await asyncio.to_thread(encode_jpeg, data)
+    part = await asyncio.to_thread(image_part, image_bytes)
+    parts = [_genai_types.Part(text=JSON_INSTRUCTIONS), part]
+    return ensure_nulls(await send_to_gemini_async(parts, _CFG))
+
+
+# already-encoded jpeg (pdf pages rendered by poppler), no pil round-trip
+def call_gemini_with_jpeg_bytes(image_bytes: bytes, source_path: Path) -> Dict[str, Any]:
+    parts = [_genai_types.Part(text=JSON_INSTRUCTIONS), image_part(image_bytes)]
+    return ensure_nulls(send_to_gemini(parts, _CFG))
+
+
+# several jpeg pages in one request, one result object per image
+def call_gemini_batch(pages: List[bytes], source_path: Path) -> List[Dict[str, Any]]:
+    parts = [_genai_types.Part(text=JSON_INSTRUCTIONS_BATCH)]
+    parts += [image_part(page) for page in pages]
+    data = send_to_gemini(parts, _BATCH_CFG)
+    if not isinstance(data, list) or len(data) != len(pages):
+        got = len(data) if isinstance(data, list) else type(data).__name__
+        raise RuntimeError(f"batch response mismatch: expected {len(pages)} objects, got {got}")
+    return [ensure_nulls(obj) for obj in data]
+
+
+# rasterize pdf in page ranges so gemini calls start before the whole file is rendered
+def iter_pdf_pages(pdf_path: Path, output_folder: str) -> Iterator[Tuple[int, Path]]:
+    from pdf2image import convert_from_path, pdfinfo_from_path
+    n_pages = int(pdfinfo_from_path(pdf_path)["Pages"])
+    for start in range(1, n_pages + 1, PDF_RENDER_CHUNK):
+        end = min(start + PDF_RENDER_CHUNK - 1, n_pages)
+        # poppler writes jpeg files directly, pages are sent as raw bytes
+        paths = convert_from_path(
+            pdf_path, dpi=PDF_IMG_DPI, fmt="jpeg",
+            jpegopt={"quality": JPEG_QUALITY, "progressive": False, "optimize": False},
+            output_folder=output_folder, paths_only=True,
+            first_page=start, last_page=end, thread_count=PDF_RENDER_THREADS,
+        )
+        for page, path in enumerate(paths, start=start):
+            yield page, Path(path)
+
+def iter_batches(items, size: int):
+    batch = []
+    for item in items:
+        batch.append(item)
+        if len(batch) == size:
+            yield batch
+            batch = []
+    if batch:
+        yield batch
+
+
 # process pdf to images and send
 def pdf_to_images_and_process(pdf_path: Path) -> List[Dict[str, Any]]:
-    from pdf2image import convert_from_path
     print(f"converting pdf: {pdf_path.name}")
-    images = convert_from_path(pdf_path, dpi=PDF_IMG_DPI)
-    results = []
 
-    for i, img in enumerate(images, start=1):
-        print(f"page {i}/{len(images)} of {pdf_path.name}")
+    def process_page(page):
+        i, image_bytes = page
         try:
-            data = call_gemini_single_key(img, pdf_path)
-            results.append({"page": i, "result": data})
+            return {"page": i, "result": call_gemini_with_jpeg_bytes(image_bytes, pdf_path)}
         except Exception as e:
-            results.append({"page": i, "error": str(e)})
-        time.sleep(1)
+            return {"page": i, "error": str(e)}
+
+    def process_chunk(batch):
+        first, last = batch[0][0], batch[-1][0]
+        chunk = []
+        for _, path in batch:
+            chunk.append(path.read_bytes())
+            os.unlink(path)   # the page lives only as bytes from here on
+        print(f"pages {first}-{last} of {pdf_path.name}")
+        if len(chunk) > 1:
+            try:
+                data = call_gemini_batch(chunk, pdf_path)
+                return [{"page": first + k, "result": res} for k, res in enumerate(data)]
+            except Exception as e:
+                print(f"batch failed for pages {first}-{last}, retrying one by one: {e}")
+        return [process_page((first + k, page)) for k, page in enumerate(chunk)]
+
+    with tempfile.TemporaryDirectory() as tmp:
+        # batches are submitted as soon as their page range is rendered, at most
+        # 2*MAX_WORKERS in flight so rendering (and the temp dir) stays bounded;
+        # the window is drained oldest first to keep page order, pacing is done by RATE_LIMITER
+        batches = iter_batches(iter_pdf_pages(pdf_path, tmp), max(1, PDF_PAGES_PER_REQUEST))
+        window = deque()
+        results = []
+        with ThreadPoolExecutor(max_workers=MAX_WORKERS) as executor:
+            for batch in batches:
+                if len(window) >= 2 * MAX_WORKERS:
+                    results.extend(window.popleft().result())
+                window.append(executor.submit(process_chunk, batch))
+            while window:
+                results.extend(window.popleft().result())
 
     print(f"{len(results)} page(s) processed from {pdf_path.name}")
     return results
@@ -165,63 +505,71 @@ def pdf_to_images_and_process(pdf_path: Path) -> List[Dict[str, Any]]:
 
 
 # parallel image processing
-def process_images_parallel(image_files: List[Path], max_workers=3) -> List[Dict[str, Any]]:
+def process_images_parallel(image_files: List[Path], max_workers=3,
+                            checkpoint: Checkpoint | None = None) -> List[Dict[str, Any]]:
     """
     parallel image processing with gemini
     
     args:
         image_files: list of image files
-        max_workers: number of simultaneous threads
+        max_workers: number of simultaneous requests
+        checkpoint: optional checkpoint, finished files are skipped and new ones recorded
     
     returns:
         results: list of processed results
     """
+    return asyncio.run(process_images_async(image_files, max_workers, checkpoint))
+
+
+async def process_images_async(image_files: List[Path], max_workers: int,
+                               checkpoint: Checkpoint | None) -> List[Dict[str, Any]]:
     results = []
     errors = []
-    lock = threading.Lock()
+    sem = asyncio.Semaphore(max_workers)
     
-    def process_single_image(file_data):
-        idx, img_path = file_data
-        thread_name = threading.current_thread().name
+    async def process_single_image(idx, img_path):
+        if checkpoint and str(img_path) in checkpoint.done:
+            print(f"[{idx}] already done: {img_path.name}")
+            results.append({**checkpoint.done[str(img_path)], "index": idx})
+            return True
         
-        try:
-            print(f"[{thread_name}] processing image [{idx}/{len(image_files)}]: {img_path.name}")
-            
-            # delay for rate limit
-            time.sleep(0.5)
-            
-            # process image
-            img = to_pil(img_path)
-            res = call_gemini_single_key(img, img_path)
-            
-            with lock:
-                results.append({
-                    "index": idx,
+        async with sem:
+            try:
+                print(f"[{idx}] processing image [{idx}/{len(image_files)}]: {img_path.name}")
+                
+                # process image
+                img = await asyncio.to_thread(to_pil, img_path)
+                res = await call_gemini_single_key(img, img_path)
+                entry = {
                     "file_id": f"{idx:03d}",
                     "file_name": img_path.name,
                     "result": res
-                })
-            
-            print(f"[{thread_name}] success: {img_path.name}")
-            return True
-            
-        except Exception as e:
-            print(f"[{thread_name}] error: {img_path.name} - {e}")
-            with lock:
-                errors.append({
-                    "index": idx,
+                }
+                if checkpoint:
+                    checkpoint.write(img_path, entry)
+                
+                results.append({**entry, "index": idx})
+                
+                print(f"[{idx}] success: {img_path.name}")
+                return True
+                
+            except Exception as e:
+                print(f"[{idx}] error: {img_path.name} - {e}")
+                entry = {
                     "file_id": f"{idx:03d}",
                     "file_name": img_path.name,
                     "error": str(e)
-                })
-            return False
+                }
+                if checkpoint:
+                    checkpoint.write(img_path, entry)
+                errors.append({**entry, "index": idx})
+                return False
     
-    # parallel execution
-    print(f"\nprocessing {len(image_files)} images with {max_workers} threads...")
+    # concurrent execution on one event loop
+    print(f"\nprocessing {len(image_files)} images, {max_workers} requests at a time...")
     
-    with ThreadPoolExecutor(max_workers=max_workers) as executor:
-        file_data = [(idx, img) for idx, img in enumerate(image_files, start=1)]
-        list(executor.map(process_single_image, file_data))
+    await asyncio.gather(*[process_single_image(idx, img) for idx, img in enumerate(image_files, start=1)],
+                         return_exceptions=True)
     
     # sort by index
     results.sort(key=lambda x: x['index'])
@@ -246,12 +594,14 @@ def process_images_parallel(image_files: List[Path], max_workers=3) -> List[Dict
 
 
 # parallel pdf processing 
-def process_pdfs_parallel(pdf_files: List[Path]) -> List[Dict[str, Any]]:
+def process_pdfs_parallel(pdf_files: List[Path],
+                          checkpoint: Checkpoint | None = None) -> List[Dict[str, Any]]:
     """
     process pdfs (each pdf serial, but pages inside each pdf parallel)
     
     args:
         pdf_files: list of pdf files
+        checkpoint: optional checkpoint, finished files are skipped and new ones recorded
     
     returns:
         results: list of results
@@ -259,24 +609,28 @@ def process_pdfs_parallel(pdf_files: List[Path]) -> List[Dict[str, Any]]:
     all_results = []
     
     for pdf_path in pdf_files:
+        if checkpoint and str(pdf_path) in checkpoint.done:
+            print(f"\nalready done: {pdf_path.name}")
+            all_results.append(checkpoint.done[str(pdf_path)])
+            continue
         print(f"\nprocessing pdf: {pdf_path.name}")
         try:
             # process pdf (pages inside are processed in parallel)
             res = pdf_to_images_and_process(pdf_path)
-            all_results.append({
+            entry = {
                 "file_id": pdf_path.stem,
                 "file_name": pdf_path.name,
                 "result": res
-            })
+            }
         except Exception as e:
-            all_results.append({
+            entry = {
                 "file_id": pdf_path.stem,
                 "file_name": pdf_path.name,
                 "error": str(e)
-            })
-        
-        # delay between pdfs
-        time.sleep(1)
+            }
+        if checkpoint:
+            checkpoint.write(pdf_path, entry)
+        all_results.append(entry)
     
     return all_results
 
@@ -296,15 +650,11 @@ def main():
         print(f"source folder not found: {SOURCE_FOLDER}")
         sys.exit(1)
 
-    files = list_files(SOURCE_FOLDER)
-    if not files:
+    image_files, pdf_files = list_and_split(SOURCE_FOLDER)
+    if not image_files and not pdf_files:
         print("no files found for processing.")
         sys.exit(0)
 
-    # separate files
-    image_files = [f for f in files if f.suffix.lower() in [".jpg", ".jpeg", ".png"]]
-    pdf_files = [f for f in files if f.suffix.lower() == ".pdf"]
-
     print(f"found: {len(image_files)} images, {len(pdf_files)} pdfs\n")
 
     # apply limits
@@ -317,6 +667,7 @@ def main():
         pdf_files = pdf_files[:MAX_PDF]
 
     all_out = []
+    checkpoint = Checkpoint(CHECKPOINT_JSONL)
 
     # parallel image processing
     if image_files:
@@ -324,20 +675,21 @@ def main():
         print("processing images (parallel)")
         print("="*70)
         
-        image_results = process_images_parallel(image_files, max_workers=MAX_WORKERS)
+        image_results = process_images_parallel(image_files, max_workers=MAX_WORKERS, checkpoint=checkpoint)
         all_out.extend(image_results)
     
     # process pdfs
     if pdf_files:
         print("\n" + "="*70)
-        print("processing pdfs (serial)")
+        print("processing pdfs (pages in parallel)")
         print("="*70)
         
-        pdf_results = process_pdfs_parallel(pdf_files)
+        pdf_results = process_pdfs_parallel(pdf_files, checkpoint=checkpoint)
         all_out.extend(pdf_results)
 
     # save results
-    OUT_JSON.write_text(json.dumps(all_out, ensure_ascii=False, indent=2), encoding="utf-8")
+    OUT_JSON.write_bytes(json_dump_bytes(all_out))
+    checkpoint.close(remove=True)
     
     # final summary
     print("\n" + "="*70)
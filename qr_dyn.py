@@ -7,12 +7,16 @@ import os
 import json
 import socket
 import concurrent.futures
+import asyncio
+import hashlib
+import itertools
+import threading
 import time
 from pathlib import Path
 from pdf2image import convert_from_path
 from PIL import Image
 from typing import Union, List, Dict, Any
-from urllib.parse import urlparse, unquote
+from urllib.parse import urlparse, urlsplit, unquote
 import warnings, ctypes, os
 warnings.filterwarnings("ignore")
 os.environ["ZBAR_LOG_LEVEL"] = "0"
@@ -44,6 +48,38 @@ if POPPLER_PATH and os.path.exists(POPPLER_PATH):
 
 # debug mode
 DEBUG_MODE = os.getenv("DEBUG_MODE", "0") == "1"
+
+# enhancement level: fast (bilateral filter) or strong (nl-means denoise, much slower)
+ENHANCE_LEVEL = os.getenv("ENHANCE_LEVEL", "fast").strip().lower()
+
+# qr variants decoded in parallel (opencv releases the gil); 1 = sequential
+QR_VARIANT_WORKERS = int(os.getenv("QR_VARIANT_WORKERS", str(min(4, os.cpu_count() or 1))))
+
+# files processed in parallel worker processes
+QR_FILE_WORKERS = int(os.getenv("QR_FILE_WORKERS", str(os.cpu_count() or 1)))
+
+# pdf pages detected in parallel threads inside one file
+QR_PAGE_WORKERS = int(os.getenv("QR_PAGE_WORKERS", str(min(8, os.cpu_count() or 1))))
+
+# long edge cap for detection (qr codes decode fine at ~2000px), 0 = no cap
+QR_MAX_LONG_EDGE = int(os.getenv("QR_MAX_LONG_EDGE", "2000"))
+
+# max dns lookups in flight during url validation
+QR_DNS_WORKERS = int(os.getenv("QR_DNS_WORKERS", str(min(64, max(8, 4 * (os.cpu_count() or 1))))))
+
+# stop a pdf at the first page with a qr (later pages get no link)
+QR_STOP_AFTER_FIRST_HIT = os.getenv("QR_STOP_AFTER_FIRST_HIT", "0") == "1"
+
+# regex patterns (compiled once)
+_URL_RX = re.compile(r"(https?://[^\s\"'<>\[\]]+|www\.[^\s\"'<>\[\]]+)", re.IGNORECASE)
+_URL_TAIL_RX = re.compile(r'[,;.!?\)\]]+$')
+_URL_HINT_RX = re.compile(r"(HTTPS?://|WWW\.)")
+_VCARD_URL_PATTERNS = tuple(re.compile(p, re.IGNORECASE | re.MULTILINE) for p in [
+    r"URL[;:]([^\r\n]+)",
+    r"URL;[^:]+:([^\r\n]+)",
+    r"item\d+\.URL[;:]([^\r\n]+)",
+    r"https?://[^\s\r\n]+",
+])
 print("superqr v6.1 (clean urls + vcard support) ready\n")
 
 
@@ -68,6 +104,26 @@ except ImportError:
     HAS_ZXING = False
     print("pyzxing not available")
 
+try:
+    import orjson
+    HAS_ORJSON = True
+except ImportError:
+    HAS_ORJSON = False
+
+try:
+    import fitz  # pymupdf, renders pdf pages in-process
+    HAS_FITZ = True
+    print("pymupdf loaded")
+except ImportError:
+    HAS_FITZ = False
+    print("pymupdf not available, using pdf2image")
+
+try:
+    import aiodns
+    HAS_AIODNS = True
+except ImportError:
+    HAS_AIODNS = False
+
 
 def clean_url(url):
     """clean url and remove extra parts"""
@@ -115,15 +171,8 @@ def extract_url_from_vcard(data):
         print(f"       detected vcard format")
     
     # search for url in vcard
-    url_patterns = [
-        r"URL[;:]([^\r\n]+)",
-        r"URL;[^:]+:([^\r\n]+)",
-        r"item\d+\.URL[;:]([^\r\n]+)",
-        r"https?://[^\s\r\n]+",
-    ]
-    
-    for pattern in url_patterns:
-        matches = re.findall(pattern, data, re.IGNORECASE | re.MULTILINE)
+    for pattern in _VCARD_URL_PATTERNS:
+        matches = pattern.findall(data)
         if matches:
             for match in matches:
                 url = match.strip()
@@ -136,25 +185,46 @@ def extract_url_from_vcard(data):
 
 def is_low_contrast(img, sharp_thresh=85, contrast_thresh=25):
     #check for low contrast image
-    g = cv2.cvtColor(img, cv2.COLOR_BGR2GRAY)
+    g = cv2.cvtColor(img, cv2.COLOR_BGR2GRAY) if img.ndim == 3 else img
+    # measure on a small copy, full resolution is not needed for this check
+    scale = 256 / max(g.shape[:2])
+    if scale < 1:
+        g = cv2.resize(g, (max(1, int(g.shape[1] * scale)), max(1, int(g.shape[0] * scale))),
+                       interpolation=cv2.INTER_AREA)
     sharpness = cv2.Laplacian(g, cv2.CV_64F).var()
     contrast = g.std()
     if DEBUG_MODE:
         print(f"   sharpness: {sharpness:.1f}, contrast: {contrast:.1f}")
     return sharpness < sharp_thresh or contrast < contrast_thresh
 
+# per-thread opencv helpers (clahe / qr detector objects are not thread-safe)
+_TLS = threading.local()
+
+def _get_clahe(clip_limit):
+    cache = getattr(_TLS, "clahe", None)
+    if cache is None:
+        cache = _TLS.clahe = {}
+    clahe = cache.get(clip_limit)
+    if clahe is None:
+        clahe = cache[clip_limit] = cv2.createCLAHE(clipLimit=clip_limit, tileGridSize=(8, 8))
+    return clahe
+
+
 def enhance_image_aggressive(img):
     #aggressive preprocessing to improve qr readability
     # 1. denoise
-    denoised = cv2.fastNlMeansDenoisingColored(img, None, 10, 10, 7, 21)
+    if ENHANCE_LEVEL == "strong":
+        denoised = cv2.fastNlMeansDenoisingColored(img, None, 10, 10, 7, 21)
+    else:
+        denoised = cv2.bilateralFilter(img, d=5, sigmaColor=50, sigmaSpace=50)
     
     # 2. convert to lab for better processing
     lab = cv2.cvtColor(denoised, cv2.COLOR_BGR2LAB)
     l, a, b = cv2.split(lab)
     
     # 3. strong clahe for contrast boost
-    clahe = cv2.createCLAHE(clipLimit=5.0, tileGridSize=(8, 8))
-    l = clahe.apply(l)
+    # (luminance only, colour channels untouched)
+    l = _get_clahe(5.0).apply(l)
     
     # 4. merge back
     enhanced = cv2.merge([l, a, b])
@@ -170,97 +240,178 @@ def enhance_image_aggressive(img):
     return enhanced
 
 
-# qr detection - advanced version
-def detect_qr_payloads_enhanced(img, img_name="image"):
-    #detect qr with multiple different methods
-    detector = cv2.QRCodeDetector()
-    payloads = []
-    methods_tried = 0
-
-    def try_decode(frame, method_name=""):
-        nonlocal methods_tried
-        methods_tried += 1
-        try:
-            # try with detectAndDecode
-            val, pts, _ = detector.detectAndDecode(frame)
-            if val and val.strip():
-                if DEBUG_MODE:
-                    print(f"       found with {method_name}")
-                payloads.append(val.strip())
-                return True
-            
-            # if couldn't decode but detected, retry
-            if pts is not None and len(pts) > 0:
-                val, _ = detector.decode(frame, pts)
-                if val and val.strip():
-                    if DEBUG_MODE:
-                        print(f"       found with {method_name} (2nd attempt)")
-                    payloads.append(val.strip())
-                    return True
-        except Exception as e:
-            if DEBUG_MODE:
-                print(f"       {method_name} failed: {e}")
-        return False
+def _payloads_to_urls(payloads):
+    """turn decoded payloads into clean, unique urls"""
+    payloads = list(dict.fromkeys(p for p in payloads if p and isinstance(p, str)))
+    out = []
+    for p in payloads:
+        # check if it's vcard
+        vcard_url = extract_url_from_vcard(p)
+        if vcard_url:
+            out.append(vcard_url)
+            continue
+        
+        # search for direct url
+        p = p.strip()
+        urls = _URL_RX.findall(p)
+        
+        if urls:
+            for url in urls:
+                url = url.strip()
+                # remove extra characters from end
+                url = _URL_TAIL_RX.sub('', url)
+                
+                if not url.lower().startswith("http"):
+                    url = "https://" + url.lower()
+                
+                # clean url
+                cleaned = clean_url(url)
+                if cleaned:
+                    out.append(cleaned)
+        elif _URL_HINT_RX.search(p.upper()):
+            if not p.lower().startswith("http"):
+                p = "https://" + p.lower()
+            cleaned = clean_url(p)
+            if cleaned:
+                out.append(cleaned)
+    
+    # remove duplicate urls
+    return list(dict.fromkeys(out))
 
-    if DEBUG_MODE:
-        print(f"    trying multiple detection methods...")
 
+def _iter_variants(img, fast_only=False):
+    """yield (frame, name) preprocessing variants, cheapest first"""
     # 1. original image
-    try_decode(img, "original")
+    yield img, "original"
     
-    # 2. grayscale
+    # 2. grayscale (computed once; single-channel frames go to the detector as-is)
     gray = cv2.cvtColor(img, cv2.COLOR_BGR2GRAY)
-    try_decode(cv2.cvtColor(gray, cv2.COLOR_GRAY2BGR), "grayscale")
+    yield gray, "grayscale"
+    if fast_only:
+        return
     
     # 3. adaptive threshold
     thresh_adapt = cv2.adaptiveThreshold(
         gray, 255, cv2.ADAPTIVE_THRESH_GAUSSIAN_C, 
         cv2.THRESH_BINARY, 51, 10
     )
-    try_decode(cv2.cvtColor(thresh_adapt, cv2.COLOR_GRAY2BGR), "adaptive threshold")
+    yield thresh_adapt, "adaptive threshold"
     
     # 4. otsu threshold
     _, thresh_otsu = cv2.threshold(gray, 0, 255, cv2.THRESH_BINARY + cv2.THRESH_OTSU)
-    try_decode(cv2.cvtColor(thresh_otsu, cv2.COLOR_GRAY2BGR), "otsu threshold")
+    yield thresh_otsu, "otsu threshold"
     
     # 5. inverted image
-    try_decode(cv2.bitwise_not(img), "inverted")
-    
-    # 6. clahe enhancement
-    lab = cv2.cvtColor(img, cv2.COLOR_BGR2LAB)
-    l, a, b = cv2.split(lab)
-    clahe = cv2.createCLAHE(clipLimit=4.0, tileGridSize=(8, 8))
-    l2 = clahe.apply(l)
-    enhanced = cv2.cvtColor(cv2.merge((l2, a, b)), cv2.COLOR_LAB2BGR)
-    try_decode(enhanced, "clahe")
+    yield cv2.bitwise_not(img), "inverted"
     
-    # 7. strong sharpening
-    kernel_sharp = np.array([[-1, -1, -1], [-1, 9, -1], [-1, -1, -1]])
-    sharp = cv2.filter2D(img, -1, kernel_sharp)
-    try_decode(sharp, "sharpened")
-    
-    # 8. morphological operations
+    # 6. morphological operations
     kernel = cv2.getStructuringElement(cv2.MORPH_RECT, (3, 3))
     morph = cv2.morphologyEx(gray, cv2.MORPH_CLOSE, kernel)
-    try_decode(cv2.cvtColor(morph, cv2.COLOR_GRAY2BGR), "morphological")
-    
-    # 9. multi-scale (different scales)
-    for scale in [0.5, 0.75, 1.5, 2.0]:
-        w = int(img.shape[1] * scale)
-        h = int(img.shape[0] * scale)
-        if w > 50 and h > 50:
-            resized = cv2.resize(img, (w, h), interpolation=cv2.INTER_CUBIC)
-            try_decode(resized, f"scale {scale}x")
+    yield morph, "morphological"
     
-    # 10. rotation
+    # 7. rotation
     rotation_map = {
         90: cv2.ROTATE_90_CLOCKWISE,
         180: cv2.ROTATE_180,
         270: cv2.ROTATE_90_COUNTERCLOCKWISE
     }
     for angle, rotate_code in rotation_map.items():
-        rotated = cv2.rotate(img, rotate_code)
-        try_decode(rotated, f"rotated {angle}")
+        yield cv2.rotate(img, rotate_code), f"rotated {angle}"
+    
+    # heavier variants last, only reached when everything above failed
+    # 8. multi-scale (different scales)
+    for scale in [0.5, 0.75, 1.5, 2.0]:
+        w = int(img.shape[1] * scale)
+        h = int(img.shape[0] * scale)
+        if w > 50 and h > 50:
+            yield cv2.resize(img, (w, h), interpolation=cv2.INTER_CUBIC), f"scale {scale}x"
+    
+    # 9. clahe enhancement
+    lab = cv2.cvtColor(img, cv2.COLOR_BGR2LAB)
+    l, a, b = cv2.split(lab)
+    l2 = _get_clahe(4.0).apply(l)
+    yield cv2.cvtColor(cv2.merge((l2, a, b)), cv2.COLOR_LAB2BGR), "clahe"
+    
+    # 10. strong sharpening
+    kernel_sharp = np.array([[-1, -1, -1], [-1, 9, -1], [-1, -1, -1]])
+    yield cv2.filter2D(img, -1, kernel_sharp), "sharpened"
+
+
+_VARIANT_POOL = None
+_VARIANT_POOL_LOCK = threading.Lock()
+
+def _get_detector():
+    # QRCodeDetector is not thread-safe, keep one per thread
+    detector = getattr(_TLS, "detector", None)
+    if detector is None:
+        detector = _TLS.detector = cv2.QRCodeDetector()
+    return detector
+
+def _variant_pool():
+    global _VARIANT_POOL
+    with _VARIANT_POOL_LOCK:
+        if _VARIANT_POOL is None:
+            _VARIANT_POOL = concurrent.futures.ThreadPoolExecutor(
+                max_workers=QR_VARIANT_WORKERS, thread_name_prefix="qr-variant")
+        return _VARIANT_POOL
+
+def _decode_variant(variant):
+    """decode one (frame, name) variant, returns payload or None"""
+    frame, method_name = variant
+    detector = _get_detector()
+    try:
+        # try with detectAndDecode
+        val, pts, _ = detector.detectAndDecode(frame)
+        if val and val.strip():
+            if DEBUG_MODE:
+                print(f"       found with {method_name}")
+            return val.strip()
+        
+        # if couldn't decode but detected, retry
+        if pts is not None and len(pts) > 0:
+            val, _ = detector.decode(frame, pts)
+            if val and val.strip():
+                if DEBUG_MODE:
+                    print(f"       found with {method_name} (2nd attempt)")
+                return val.strip()
+    except Exception as e:
+        if DEBUG_MODE:
+            print(f"       {method_name} failed: {e}")
+    return None
+
+
+# qr detection - advanced version
+def detect_qr_payloads_enhanced(img, img_name="image", fast_only=False):
+    #detect qr with multiple different methods, stop at the first variant that gives a url
+    payloads = []
+    methods_tried = 0
+
+    if DEBUG_MODE:
+        print(f"    trying multiple detection methods...")
+
+    # decode variants in waves of QR_VARIANT_WORKERS, payloads kept in variant order
+    variants = _iter_variants(img, fast_only)
+    workers = max(1, QR_VARIANT_WORKERS)
+    while True:
+        wave = list(itertools.islice(variants, workers))
+        if not wave:
+            break
+        methods_tried += len(wave)
+        if len(wave) == 1:
+            found = [_decode_variant(wave[0])]
+        else:
+            found = list(_variant_pool().map(_decode_variant, wave))
+        found = [p for p in found if p]
+        if found:
+            payloads.extend(found)
+            out = _payloads_to_urls(payloads)
+            if out:
+                if DEBUG_MODE:
+                    print(f"   stopped after {methods_tried} methods")
+                return out
+    
+    if fast_only:
+        return None
     
     '''
     # 11. use pyzbar
@@ -309,51 +460,22 @@ def detect_qr_payloads_enhanced(img, img_name="image"):
             if DEBUG_MODE:
                 print(f"       zxing failed: {e}")
     
-    # remove duplicates
-    payloads = list(dict.fromkeys(p for p in payloads if p and isinstance(p, str)))
-    
     if DEBUG_MODE:
-        print(f"   tried {methods_tried} methods, found {len(payloads)} unique payload(s)")
-    
-    # process and extract url
-    out = []
-    for p in payloads:
-        # check if it's vcard
-        vcard_url = extract_url_from_vcard(p)
-        if vcard_url:
-            out.append(vcard_url)
-            continue
-        
-        # search for direct url
-        p = p.strip()
-        urls = re.findall(r"(https?://[^\s\"'<>\[\]]+|www\.[^\s\"'<>\[\]]+)", p, re.IGNORECASE)
-        
-        if urls:
-            for url in urls:
-                url = url.strip()
-                # remove extra characters from end
-                url = re.sub(r'[,;.!?\)\]]+$', '', url)
-                
-                if not url.lower().startswith("http"):
-                    url = "https://" + url.lower()
-                
-                # clean url
-                cleaned = clean_url(url)
-                if cleaned:
-                    out.append(cleaned)
-        elif re.search(r"(HTTPS?://|WWW\.)", p.upper()):
-            if not p.lower().startswith("http"):
-                p = "https://" + p.lower()
-            cleaned = clean_url(p)
-            if cleaned:
-                out.append(cleaned)
-    
-    # remove duplicate urls
-    out = list(dict.fromkeys(out))
+        print(f"   tried {methods_tried} methods, found {len(payloads)} payload(s)")
     
+    out = _payloads_to_urls(payloads)
     return out if out else None
 
 
+_DBG_JPEG_PARAMS = [cv2.IMWRITE_JPEG_QUALITY, 80, cv2.IMWRITE_JPEG_OPTIMIZE, 0]
+
+def _dbg_save(name, img, folder=None):
+    """write a debug image, no-op unless DEBUG_MODE"""
+    if not DEBUG_MODE:
+        return
+    cv2.imwrite(str((folder or DEBUG_DIR) / name), img, _DBG_JPEG_PARAMS)
+
+
 def process_image_for_qr(image_path: Path) -> Union[List[str], None]:
     """process image for qr detection"""
     if DEBUG_MODE:
@@ -364,21 +486,35 @@ def process_image_for_qr(image_path: Path) -> Union[List[str], None]:
         print(f"    cannot read {image_path.name}")
         return None
     
+    return process_image_for_qr_array(img, image_path.stem)
+
+
+def process_image_for_qr_array(img: np.ndarray, stem: str) -> Union[List[str], None]:
+    """qr detection on an already decoded bgr image"""
     if DEBUG_MODE:
         print(f"    size: {img.shape[1]}x{img.shape[0]}")
-        cv2.imwrite(str(DEBUG_DIR / f"{image_path.stem}_01_original.jpg"), img)
+    _dbg_save(f"{stem}_01_original.jpg", img)
+    
+    # downscale very large scans, enhancement and detection cost scale with pixel count
+    h, w = img.shape[:2]
+    m = max(h, w)
+    if QR_MAX_LONG_EDGE and m > QR_MAX_LONG_EDGE:
+        scale = QR_MAX_LONG_EDGE / m
+        img = cv2.resize(img, (int(w * scale), int(h * scale)), interpolation=cv2.INTER_AREA)
     
     # check contrast
     low = is_low_contrast(img)
     
-    # enhancement
-    enhanced = enhance_image_aggressive(img)
+    # fast pass on the raw image, the heavy enhancement only runs if it finds nothing
+    result = detect_qr_payloads_enhanced(img, stem, fast_only=True)
     
-    if DEBUG_MODE:
-        cv2.imwrite(str(DEBUG_DIR / f"{image_path.stem}_02_enhanced.jpg"), enhanced)
-    
-    # qr detection
-    result = detect_qr_payloads_enhanced(enhanced, image_path.stem)
+    if not result:
+        # enhancement
+        enhanced = enhance_image_aggressive(img)
+        _dbg_save(f"{stem}_02_enhanced.jpg", enhanced)
+        
+        # qr detection
+        result = detect_qr_payloads_enhanced(enhanced, stem)
     
     if result:
         print(f"    found {len(result)} clean url(s)")
@@ -390,12 +526,122 @@ def process_image_for_qr(image_path: Path) -> Union[List[str], None]:
     return result
 
 
+def _pixmap_to_bgr(pix) -> np.ndarray:
+    """pymupdf pixmap -> bgr ndarray"""
+    img = np.frombuffer(pix.samples, dtype=np.uint8).reshape(pix.height, pix.width, pix.n)
+    if pix.n == 4:
+        return cv2.cvtColor(img, cv2.COLOR_RGBA2BGR)
+    if pix.n == 3:
+        return cv2.cvtColor(img, cv2.COLOR_RGB2BGR)
+    return cv2.cvtColor(img[:, :, 0], cv2.COLOR_GRAY2BGR)
+
+
+def _detect_pages(pdf_path: Path, pages, total_pages: int, temp_dir: Path) -> List[Dict[str, Any]]:
+    """run qr detection over (page_no, bgr) pairs on a thread pool, results in page order"""
+    results = [None] * total_pages
+    workers = max(1, min(QR_PAGE_WORKERS, total_pages))
+    # caps how many rendered pages are held in memory at once
+    slots = threading.BoundedSemaphore(workers * 2)
+    # pixel-identical pages (repeated templates) share one detection
+    qr_cache: Dict[bytes, concurrent.futures.Future] = {}
+    cache_lock = threading.Lock()
+    first_hit = [None]  # lowest page with a qr, only used with QR_STOP_AFTER_FIRST_HIT
+
+    def past_first_hit(i):
+        return QR_STOP_AFTER_FIRST_HIT and first_hit[0] is not None and i > first_hit[0]
+
+    def detect(img, stem):
+        # full-resolution pixels, a thumbnail can blur two different qr payloads together
+        h = hashlib.blake2b(img.tobytes(), digest_size=16)
+        h.update(repr(img.shape).encode())
+        h = h.digest()
+        with cache_lock:
+            fut = qr_cache.get(h)
+            owner = fut is None
+            if owner:
+                fut = qr_cache[h] = concurrent.futures.Future()
+        if not owner:
+            if DEBUG_MODE:
+                print(f"    {stem}: same page as before, reusing result")
+            return fut.result()
+        try:
+            qr_links = process_image_for_qr_array(img, stem)
+        except Exception as e:
+            fut.set_exception(e)
+            raise
+        fut.set_result(qr_links)
+        return qr_links
+
+    def run(i, img):
+        try:
+            if past_first_hit(i):
+                return
+            print(f"\n    page {i}/{total_pages}")
+            stem = f"{pdf_path.stem}_page_{i:03d}"
+            _dbg_save(f"{stem}.jpg", img, temp_dir)
+            qr_links = detect(img, stem)
+            results[i - 1] = {"page": i, "qr_link": qr_links[0] if qr_links else None}
+            if qr_links and QR_STOP_AFTER_FIRST_HIT:
+                with cache_lock:
+                    if first_hit[0] is None or i < first_hit[0]:
+                        first_hit[0] = i
+        finally:
+            slots.release()
+
+    with concurrent.futures.ThreadPoolExecutor(max_workers=workers) as ex:
+        futures = []
+        for i, img in pages:
+            if QR_STOP_AFTER_FIRST_HIT and first_hit[0] is not None:
+                print(f"    qr found on page {first_hit[0]}, skipping remaining pages")
+                break  # remaining pages are not even rendered
+            slots.acquire()
+            futures.append(ex.submit(run, i, img))
+        for f in futures:
+            f.result()
+    
+    # skipped pages (and pages after the first hit) get no link
+    for i in range(total_pages):
+        if results[i] is None or past_first_hit(i + 1):
+            results[i] = {"page": i + 1, "qr_link": None}
+    return results
+
+
+def _iter_fitz_pages(doc):
+    # rendering stays on the calling thread, pymupdf documents are not thread-safe
+    for i, page in enumerate(doc, start=1):
+        yield i, _pixmap_to_bgr(page.get_pixmap(dpi=PDF_IMG_DPI))
+
+
+def process_pdf_with_fitz(pdf_path: Path, temp_dir: Path) -> Dict[str, Any]:
+    """render pages in-process with pymupdf, no jpeg round-trip"""
+    try:
+        doc = fitz.open(str(pdf_path))
+    except Exception as e:
+        print(f"    pdf open failed: {e}")
+        return {
+            "file_id": pdf_path.stem,
+            "file_name": pdf_path.name,
+            "error": str(e),
+            "result": []
+        }
+    
+    with doc:
+        total_pages = doc.page_count
+        print(f"    total pages: {total_pages}")
+        results = _detect_pages(pdf_path, _iter_fitz_pages(doc), total_pages, temp_dir)
+    
+    return {"file_id": pdf_path.stem, "file_name": pdf_path.name, "result": results}
+
+
 def process_pdf_for_qr(pdf_path: Path) -> Dict[str, Any]:
     """process pdf and convert to image"""
     print(f"\n processing pdf: {pdf_path.name}")
     temp_dir = SESSION_DIR / "_pdf_pages"
     os.makedirs(temp_dir, exist_ok=True)
     
+    if HAS_FITZ:
+        return process_pdf_with_fitz(pdf_path, temp_dir)
+    
     kwargs = {}
     if POPPLER_PATH and os.path.exists(POPPLER_PATH):
         kwargs["poppler_path"] = POPPLER_PATH
@@ -415,16 +661,12 @@ def process_pdf_for_qr(pdf_path: Path) -> Dict[str, Any]:
     
     total_pages = len(images)
     print(f"    total pages: {total_pages}")
-    results = []
-
-    for i, img in enumerate(images, start=1):
-        page_image_path = temp_dir / f"{pdf_path.stem}_page_{i:03d}.jpg"
-        img.save(page_image_path, "JPEG", quality=95)
-        print(f"\n    page {i}/{total_pages}")
-
-        qr_links = process_image_for_qr(page_image_path)
-        page_result = {"page": i, "qr_link": qr_links[0] if qr_links else None}
-        results.append(page_result)
+    # pil page -> bgr ndarray in memory, no jpeg encode/decode per page
+    pages = (
+        (i, cv2.cvtColor(np.asarray(pil_img.convert("RGB")), cv2.COLOR_RGB2BGR))
+        for i, pil_img in enumerate(images, start=1)
+    )
+    results = _detect_pages(pdf_path, pages, total_pages, temp_dir)
 
     return {"file_id": pdf_path.stem, "file_name": pdf_path.name, "result": results}
 
@@ -441,103 +683,206 @@ def process_image_file(image_path: Path) -> Dict[str, Any]:
 
 
 
-def save_json(path, data):
-    """save json with proper encoding"""
-    Path(path).write_text(
-        json.dumps(data, indent=4, ensure_ascii=False), 
-        encoding="utf-8"
-    )
+def _dumps_line(obj):
+    """one compact json document + newline (jsonl)"""
+    if HAS_ORJSON:
+        return orjson.dumps(obj, option=orjson.OPT_NON_STR_KEYS) + b"\n"
+    return json.dumps(obj, ensure_ascii=False).encode("utf-8") + b"\n"
+
+
+def _iter_entries(input_data):
+    """yield result entries from a list, a .jsonl file or a .json array file"""
+    if isinstance(input_data, list):
+        yield from input_data
+        return
+    path = Path(input_data)
+    if path.suffix.lower() == ".jsonl":
+        with open(path, "rb") as f:
+            for line in f:
+                if line.strip():
+                    yield orjson.loads(line) if HAS_ORJSON else json.loads(line)
+        return
+    raw = path.read_bytes()
+    yield from (orjson.loads(raw) if HAS_ORJSON else json.loads(raw))
+
+
+def jsonl_to_json(src, dst):
+    """convert a jsonl file into one json array, line by line"""
+    with open(src, "rb") as fin, open(dst, "wb") as fout:
+        fout.write(b"[")
+        first = True
+        for line in fin:
+            line = line.strip()
+            if not line:
+                continue
+            fout.write((b"\n" if first else b",\n") + line)
+            first = False
+        fout.write(b"\n]\n")
 
 
 
 def extract_urls(entry):
     """extract urls from results"""
-    urls = []
-    for item in entry.get("result", []):
-        link = item.get("qr_link")
-        if link:
-            urls.append(link)
-    return list(dict.fromkeys(urls))
-
-def is_domain_alive(url, timeout=5):
-    """check if domain is alive"""
+    return list(dict.fromkeys(
+        item["qr_link"] for item in entry.get("result", ()) if item.get("qr_link")
+    ))
+
+def _host_of(url):
+    # lowercased host without port/userinfo, leading www. dropped
+    try:
+        h = urlsplit(url).hostname or ""
+    except ValueError:
+        return ""
+    return h[4:] if h.startswith("www.") else h
+
+async def _resolve(resolver, host, timeout, limit):
+    if not host:
+        return False
     try:
-        host = re.sub(r"^https?://(www\.)?", "", url).split("/")[0]
-        socket.setdefaulttimeout(timeout)
-        socket.gethostbyname(host)
-        return True
+        async with limit:
+            return await _lookup(resolver, host, timeout)
     except Exception:
         return False
 
+async def _lookup(resolver, host, timeout):
+    if resolver is not None:
+        await asyncio.wait_for(resolver.gethostbyname(host, socket.AF_INET), timeout)
+    else:
+        loop = asyncio.get_running_loop()
+        await asyncio.wait_for(loop.getaddrinfo(host, None, family=socket.AF_INET), timeout)
+    return True
+
+async def _resolve_all(hosts, timeout=5):
+    """resolve all hosts concurrently, returns {host: alive}"""
+    resolver = None
+    if HAS_AIODNS:
+        try:
+            resolver = aiodns.DNSResolver(timeout=timeout)
+        except Exception:
+            pass  # e.g. proactor loop on windows, fall back to getaddrinfo
+    limit = asyncio.Semaphore(max(1, QR_DNS_WORKERS))
+    alive = await asyncio.gather(*[_resolve(resolver, h, timeout, limit) for h in hosts])
+    return dict(zip(hosts, alive))
 
 
-def clean_qr_json(input_file, output_file):
-    """clean and validate urls"""
+def clean_qr_json(input_data, output_file):
+    """clean and validate urls (input_data: results list, raw .jsonl or raw .json path)"""
     print("\ncleaning and validating extracted qr urls...")
     
-    if not Path(input_file).exists():
-        print(f"    input file not found: {input_file}")
+    if not isinstance(input_data, list) and not Path(input_data).exists():
+        print(f"    input file not found: {input_data}")
         return
     
-    data = json.loads(Path(input_file).read_text(encoding="utf-8"))
-    final_results = []
-    
-    for entry in data:
-        if "error" in entry:
-            final_results.append(entry)
-            continue
-            
-        urls = extract_urls(entry)
-        valid_urls = []
-        
-        if urls:
-            print(f"    validating {len(urls)} url(s) from {entry.get('file_name')}...")
-            with concurrent.futures.ThreadPoolExecutor(max_workers=8) as executor:
-                futures = {executor.submit(is_domain_alive, u): u for u in urls}
-                for f in concurrent.futures.as_completed(futures):
-                    u = futures[f]
-                    try:
-                        if f.result():
-                            valid_urls.append(u)
-                            print(f"       {u}")
-                        else:
-                            print(f"       {u} (domain unreachable)")
-                    except Exception as e:
-                        print(f"        {u} (check failed: {e})")
-        
-        result_pages = []
-        for item in entry.get("result", []):
-            page = item.get("page", 1)
-            link = item.get("qr_link")
+    # validate each unique url once per run; hosts resolved together, all lookups in flight
+    # (first streaming pass only collects urls)
+    urls = list(dict.fromkeys(
+        u for entry in _iter_entries(input_data) if "error" not in entry for u in extract_urls(entry)
+    ))
+    hosts = list(dict.fromkeys(_host_of(u) for u in urls))
+    host_alive = asyncio.run(_resolve_all(hosts)) if hosts else {}
+    alive = {u: host_alive.get(_host_of(u), False) for u in urls}
+    
+    dead = [u for u, ok in alive.items() if not ok]
+    print(f"    {len(urls) - len(dead)}/{len(urls)} unique url(s) reachable ({len(hosts)} host(s))")
+    for u in dead:
+        print(f"       {u} (domain unreachable)")
+    
+    # second pass streams cleaned entries to jsonl, then into the final json array
+    output_file = Path(output_file)
+    clean_jsonl = output_file.with_suffix(".jsonl")
+    with open(clean_jsonl, "wb") as out_f:
+        for entry in _iter_entries(input_data):
+            if "error" in entry:
+                out_f.write(_dumps_line(entry))
+                continue
             
-            if link and link in valid_urls:
-                result_pages.append({"page": page, "qr_link": link})
+            orig = entry.get("result", [])
+            if all(item.get("qr_link") is None or alive.get(item["qr_link"], False) for item in orig):
+                # nothing to null out, keep the original page list
+                result_pages = orig
             else:
-                result_pages.append({"page": page, "qr_link": None})
-        
-        final_results.append({
-            "file_id": entry.get("file_id"),
-            "file_name": entry.get("file_name"),
-            "result": result_pages
-        })
-    
-    save_json(output_file, final_results)
+                result_pages = []
+                for item in orig:
+                    page = item.get("page", 1)
+                    link = item.get("qr_link")
+                    
+                    if link and alive.get(link, False):
+                        result_pages.append({"page": page, "qr_link": link})
+                    else:
+                        result_pages.append({"page": page, "qr_link": None})
+            
+            out_f.write(_dumps_line({
+                "file_id": entry.get("file_id"),
+                "file_name": entry.get("file_name"),
+                "result": result_pages
+            }))
+    
+    jsonl_to_json(clean_jsonl, output_file)
+    clean_jsonl.unlink(missing_ok=True)
     print(f"\n cleaned results saved -> {output_file}")
 
 
+_INPUT_EXTS = (".jpg", ".jpeg", ".png", ".pdf")
+
+def _iter_inputs(root):
+    """yield input images/pdfs, without descending into generated folders"""
+    with os.scandir(root) as it:
+        for e in it:
+            if e.is_dir(follow_symlinks=False):
+                if e.name == "_pdf_pages" or e.name.endswith("_debug"):
+                    continue
+                yield from _iter_inputs(e.path)
+            elif e.name.lower().endswith(_INPUT_EXTS):
+                yield Path(e.path)
+
+
+def _init_worker(page_workers=1):
+    # the pool already uses every core: one opencv thread and sequential variants per process,
+    # page threads only get the cores left over by the file-level pool
+    global QR_VARIANT_WORKERS, QR_PAGE_WORKERS
+    cv2.setNumThreads(1)
+    QR_VARIANT_WORKERS = 1
+    QR_PAGE_WORKERS = max(1, min(QR_PAGE_WORKERS, page_workers))
+
+
+def _process_one(path_str, idx, total):
+    """process one file inside a worker process"""
+    f = Path(path_str)
+    print("=" * 60)
+    print(f" [{idx}/{total}] processing: {f.name}")
+    print("=" * 60)
+    start_time = time.time()
+    
+    try:
+        if f.suffix.lower() == ".pdf":
+            res = process_pdf_for_qr(f)
+        else:
+            res = process_image_file(f)
+        
+        elapsed = time.time() - start_time
+        print(f"\n completed {f.name} in {elapsed:.1f}s")
+        return res
+        
+    except Exception as e:
+        print(f"\n error processing {f.name}: {e}")
+        import traceback
+        if DEBUG_MODE:
+            traceback.print_exc()
+        return {
+            "file_id": f.stem,
+            "file_name": f.name,
+            "error": str(e),
+            "result": []
+        }
+
+
 def main():
     """main function"""
     print("=" * 60)
     print("starting superqr v6.1 processing")
     print("=" * 60)
     
-    results = []
-    files = sorted([
-        f for f in Path(IMAGES_FOLDER).rglob("*")
-        if f.suffix.lower() in [".jpg", ".jpeg", ".png", ".pdf"]
-        and "_pdf_pages" not in str(f)
-        and "_debug" not in str(f)
-    ])
+    files = sorted(_iter_inputs(IMAGES_FOLDER))
     
     if not files:
         print(f"\n  no image/pdf files found in {IMAGES_FOLDER}")
@@ -546,41 +891,42 @@ def main():
     
     print(f"\n found {len(files)} file(s) to process\n")
 
-    for idx, f in enumerate(files, 1):
-        print("=" * 60)
-        print(f" [{idx}/{len(files)}] processing: {f.name}")
-        print("=" * 60)
-        start_time = time.time()
-        
-        try:
-            if f.suffix.lower() == ".pdf":
-                res = process_pdf_for_qr(f)
-            else:
-                res = process_image_file(f)
-            
-            results.append(res)
-            elapsed = time.time() - start_time
-            print(f"\n completed {f.name} in {elapsed:.1f}s")
-            
-        except Exception as e:
-            print(f"\n error processing {f.name}: {e}")
-            import traceback
-            if DEBUG_MODE:
-                traceback.print_exc()
-            results.append({
-                "file_id": f.stem,
-                "file_name": f.name,
-                "error": str(e),
-                "result": []
-            })
+    # one process per file; finished files are appended to the raw jsonl in input order
+    raw_jsonl = OUTPUT_JSON_RAW.with_suffix(".jsonl")
+    total_qr = 0
+    workers = max(1, min(QR_FILE_WORKERS, len(files)))
+    page_workers = max(1, (os.cpu_count() or 1) // workers)
+    with open(raw_jsonl, "wb") as raw_f, \
+            concurrent.futures.ProcessPoolExecutor(max_workers=workers, initializer=_init_worker,
+                                                   initargs=(page_workers,)) as ex:
+        futures = [
+            ex.submit(_process_one, str(f), idx, len(files))
+            for idx, f in enumerate(files, 1)
+        ]
+        # waiting in submission order keeps the output order without a reorder buffer
+        for f, fut in zip(files, futures):
+            try:
+                res = fut.result()
+            except Exception as e:
+                print(f"\n worker failed on {f.name}: {e}")
+                res = {
+                    "file_id": f.stem,
+                    "file_name": f.name,
+                    "error": str(e),
+                    "result": []
+                }
+            raw_f.write(_dumps_line(res))
+            raw_f.flush()
+            total_qr += sum(1 for item in res.get("result", []) if item.get("qr_link"))
     
     # save raw results
     print("\n" + "=" * 60)
-    save_json(OUTPUT_JSON_RAW, results)
+    jsonl_to_json(raw_jsonl, OUTPUT_JSON_RAW)
     print(f" raw results saved {OUTPUT_JSON_RAW}")
     
-    # clean and validate
-    clean_qr_json(OUTPUT_JSON_RAW, OUTPUT_JSON_CLEAN)
+    # clean and validate (streamed from the jsonl)
+    clean_qr_json(raw_jsonl, OUTPUT_JSON_CLEAN)
+    raw_jsonl.unlink(missing_ok=True)
     
     print("\n" + "=" * 60)
     print(f" processing completed!")
@@ -588,11 +934,6 @@ def main():
     print("=" * 60)
     
     # results summary
-    total_qr = sum(
-        1 for entry in results 
-        for item in entry.get("result", []) 
-        if item.get("qr_link")
-    )
     print(f"\n summary: found {total_qr} qr code(s) in {len(files)} file(s)")
     
     if DEBUG_MODE:
@@ -2,8 +2,11 @@
 from pathlib import Path
 import os, re, json, time, random, threading, socket, shutil
 from queue import Queue
-from urllib.parse import urljoin, urlparse
+from collections import deque
+from urllib.parse import urljoin, urlparse, urlsplit, urlunsplit, parse_qsl, urlencode
+from functools import lru_cache
 import requests
+from requests.adapters import HTTPAdapter
 from bs4 import BeautifulSoup, XMLParsedAsHTMLWarning
 import warnings
 warnings.filterwarnings("ignore", category=XMLParsedAsHTMLWarning)
@@ -11,6 +14,20 @@ import pandas as pd
 import urllib3
 urllib3.disable_warnings(urllib3.exceptions.InsecureRequestWarning)
 
+# c parser when available, stdlib parser otherwise
+try:
+    import lxml
+    HTML_PARSER = "lxml"
+except ImportError:
+    HTML_PARSER = "html.parser"
+
+# faster json when available
+try:
+    import orjson
+    HAS_ORJSON = True
+except ImportError:
+    HAS_ORJSON = False
+
  
 # gemini sdk import 
 try:
@@ -49,10 +66,16 @@ REQUEST_TIMEOUT = (8, 20)
 SLEEP_BETWEEN = (0.8, 2.0)
 MAX_RETRIES_HTTP = 3
 MAX_RETRIES_GEMINI = 3
+# text budgets in utf-8 bytes (persian is 2 bytes per char)
+PAGE_TEXT_BYTES = 40000
+SITE_TEXT_BYTES = 180000
 CHECK_DOMAIN_EXISTENCE = True
 
 IRANIAN_TLDS = ['.ir', '.ac.ir', '.co.ir', '.org.ir', '.gov.ir', '.id.ir', '.net.ir']
 
+# one suffix test for all iranian tlds (optional port allowed)
+_IR_SUFFIX_RX = re.compile("(?:" + "|".join(map(re.escape, IRANIAN_TLDS)) + r")(?::\d+)?$")
+
 client = genai.Client(api_key=GOOGLE_API_KEY)
 lock = threading.Lock()
 
@@ -61,8 +84,10 @@ lock = threading.Lock()
 RAW_INPUT = MIX_OCR_QR_JSON
 CLEAN_URLS = Path(os.getenv("CLEAN_URLS", SESSION_DIR / "urls_clean.json"))
 OUTPUT_JSON = Path(os.getenv("OUTPUT_JSON", OUT_JSON))
+OUTPUT_JSONL = OUTPUT_JSON.with_suffix(".jsonl")
 OUTPUT_EXCEL = Path(os.getenv("OUTPUT_EXCEL", WEB_ANALYSIS_XLSX))
-TEMP_EXCEL = Path(os.getenv("TEMP_EXCEL", SESSION_DIR / "web_analysis.tmp.xlsx"))
+# temp file next to the output so the final swap is an atomic rename
+TEMP_EXCEL = Path(os.getenv("TEMP_EXCEL", OUTPUT_EXCEL.with_name(OUTPUT_EXCEL.stem + ".tmp.xlsx")))
 
 
 # fields & prompts
@@ -125,10 +150,55 @@ HEADERS = {
     "Connection": "keep-alive",
 }
 
+# one pooled session so pages of a site reuse their tcp/tls connection
+SESSION = requests.Session()
+_adapter = HTTPAdapter(pool_connections=64, pool_maxsize=256, max_retries=0)
+SESSION.mount("https://", _adapter)
+SESSION.mount("http://", _adapter)
+SESSION.headers.update(HEADERS)
+
+# compiled patterns
+_WS_RX = re.compile(r"\s+")
+_SCHEME_RX = re.compile(r"^https?://", re.I)
+_URL_RX = re.compile(r"(https?://[^\s\"'<>]+|www\.[^\s\"'<>]+)", re.I)
+_DOMAIN_RX = re.compile(r"^([a-z0-9]+(-[a-z0-9]+)*\.)+[a-z]{2,}$", re.I)
+
+
 # utility functions
+def json_loads(txt):
+    return orjson.loads(txt) if HAS_ORJSON else json.loads(txt)
+
+def json_dump_bytes(obj):
+    if HAS_ORJSON:
+        return orjson.dumps(obj, option=orjson.OPT_INDENT_2 | orjson.OPT_NON_STR_KEYS)
+    return json.dumps(obj, ensure_ascii=False, indent=2).encode("utf-8")
+
+def json_line(obj):
+    if HAS_ORJSON:
+        return orjson.dumps(obj, option=orjson.OPT_NON_STR_KEYS | orjson.OPT_APPEND_NEWLINE)
+    return (json.dumps(obj, ensure_ascii=False) + "\n").encode("utf-8")
+
+def open_log(path: Path):
+    """append-mode jsonl log, records of a crashed earlier run are kept"""
+    log = open(path, "ab")
+    # a crash can leave a torn last line, start ours on a fresh one
+    if log.tell() > 0:
+        with open(path, "rb") as f:
+            f.seek(-1, os.SEEK_END)
+            if f.read(1) != b"\n":
+                log.write(b"\n")
+    return log
+
+def utf8_truncate(s: str, n: int) -> str:
+    """cut a string to at most n utf-8 bytes without splitting a character"""
+    b = s.encode("utf-8")
+    if len(b) <= n:
+        return s
+    return b[:n].decode("utf-8", "ignore")
+
 def normalize_root(url: str) -> str:
     u = url.strip()
-    if not re.match(r"^https?://", u, re.I):
+    if not _SCHEME_RX.match(u):
         u = "https://" + u
     p = urlparse(u)
     return f"{p.scheme}://{p.netloc}".lower()
@@ -136,7 +206,7 @@ def normalize_root(url: str) -> str:
 def is_iranian_domain(url: str) -> bool:
     try:
         netloc = urlparse(normalize_root(url)).netloc.lower()
-        return any(netloc.endswith(tld) for tld in IRANIAN_TLDS)
+        return _IR_SUFFIX_RX.search(netloc) is not None
     except:
         return False
 
@@ -166,6 +236,17 @@ def normalize_url_for_dedup(url: str) -> str:
     return url
 
 
+@lru_cache(maxsize=16384)
+def canonical_url(url):
+    """crawl dedupe key: no fragment, lower host, sorted query, no default port or trailing slash"""
+    p = urlsplit(url)
+    scheme = p.scheme.lower()
+    netloc = p.netloc.lower()
+    if (scheme, netloc.rsplit(":", 1)[-1]) in (("http", "80"), ("https", "443")):
+        netloc = netloc.rsplit(":", 1)[0]
+    query = urlencode(sorted(parse_qsl(p.query, keep_blank_values=True)))
+    return urlunsplit((scheme, netloc, p.path.rstrip("/") or "/", query, ""))
+
 def domain_exists(url: str) -> bool:
     try:
         host = urlparse(normalize_root(url)).netloc
@@ -180,7 +261,7 @@ def domain_exists(url: str) -> bool:
 def extract_urls_from_mix(input_path: str, output_path: str):
     print("extracting scrapable urls from mix_ocr_qr.json...")
     try:
-        raw = json.loads(Path(input_path).read_text(encoding="utf-8"))
+        raw = json_loads(Path(input_path).read_bytes())
     except Exception as e:
         print(f"error reading input json: {e}")
         return []
@@ -194,8 +275,6 @@ def extract_urls_from_mix(input_path: str, output_path: str):
     FILE_EXCLUDE = (".jpg", ".jpeg", ".png", ".gif", ".svg", ".pdf", ".zip", 
                     ".rar", ".xls", ".xlsx", ".doc", ".docx", ".mp4", ".mp3")
     
-    url_pattern = re.compile(r"(https?://[^\s\"'<>]+|www\.[^\s\"'<>]+)", re.I)
-    domain_pattern = re.compile(r"^([a-z0-9]+(-[a-z0-9]+)*\.)+[a-z]{2,}$", re.I)
     
     stats = {"ocr": 0, "qr": 0, "excel": 0, "direct_urls": 0, "social_excluded": 0, "file_excluded": 0}
 
@@ -235,14 +314,14 @@ def extract_urls_from_mix(input_path: str, output_path: str):
 
     def collect(obj, source="ocr"):
         if isinstance(obj, str):
-            for m in url_pattern.findall(obj):
+            for m in _URL_RX.findall(obj):
                 add_url(m, source)
                     
         elif isinstance(obj, list):
             for v in obj:
                 if isinstance(v, str):
                     v_stripped = v.strip()
-                    if domain_pattern.match(v_stripped):
+                    if _DOMAIN_RX.match(v_stripped):
                         add_url(v_stripped, "direct_urls")
                     else:
                         collect(v, source)
@@ -301,10 +380,7 @@ def extract_urls_from_mix(input_path: str, output_path: str):
                 print(f"  domain not found: {u}")
         roots = valid_roots
 
-    Path(output_path).write_text(
-        json.dumps(roots, ensure_ascii=False, indent=2), 
-        encoding="utf-8"
-    )
+    Path(output_path).write_bytes(json_dump_bytes(roots))
     
     print(f"\n{'='*60}")
     print("url extraction summary:")
@@ -322,16 +398,16 @@ def extract_urls_from_mix(input_path: str, output_path: str):
 
 
 # web crawling & cleaning 
-def fetch(url: str) -> tuple[str, str]:
-    verify_ssl = not is_iranian_domain(url)
+def fetch(url: str, verify_ssl: bool = None) -> tuple[str, str]:
+    if verify_ssl is None:
+        verify_ssl = not is_iranian_domain(url)
     ssl_status = "ssl on" if verify_ssl else "ssl off (iranian)"
     
     for i in range(MAX_RETRIES_HTTP):
         try:
             print(f"  attempt {i+1}/{MAX_RETRIES_HTTP} [{ssl_status}]: {url}")
-            r = requests.get(
+            r = SESSION.get(
                 url, 
-                headers=HEADERS, 
                 timeout=REQUEST_TIMEOUT, 
                 verify=verify_ssl,
                 allow_redirects=True
@@ -347,9 +423,8 @@ def fetch(url: str) -> tuple[str, str]:
             if verify_ssl and i == 0:
                 print(f"   ssl error, retrying without verification: {url}")
                 try:
-                    r = requests.get(
+                    r = SESSION.get(
                         url, 
-                        headers=HEADERS, 
                         timeout=REQUEST_TIMEOUT, 
                         verify=False,
                         allow_redirects=True
@@ -379,50 +454,53 @@ def fetch(url: str) -> tuple[str, str]:
     
     return ("", "MAX_RETRIES_EXCEEDED")
 
-def clean_text(html: str) -> str:
-    if not html: return ""
-    soup = BeautifulSoup(html, "html.parser")
+def parse_page(html: str) -> tuple[str, list]:
+    """one parse per page: cleaned text and the hrefs of its links"""
+    if not html: return ("", [])
+    soup = BeautifulSoup(html, HTML_PARSER)
+    hrefs = [a["href"] for a in soup.find_all("a", href=True)]
     for t in soup(["script","style","noscript","iframe","svg"]): t.extract()
     text = soup.get_text(" ", strip=True)
-    return re.sub(r"\s+", " ", text).strip()
+    return (_WS_RX.sub(" ", text).strip(), hrefs)
 
 
 
 def crawl_site(root: str, max_depth=MAX_DEPTH, max_pages=MAX_PAGES_PER_SITE) -> tuple[str, str]:
     print(f"\nstarting crawl: {root}")
+    # every crawled page is under root, classify the host once
+    verify_ssl = not is_iranian_domain(root)
     seen = set()
-    q = [(root, 0)]
+    q = deque([(root, 0)])
     texts = []
     errors = []
     
     while q and len(seen) < max_pages:
-        url, d = q.pop(0)
-        if url in seen or d > max_depth: continue
-        seen.add(url)
+        url, d = q.popleft()
+        key = canonical_url(url)
+        if key in seen or d > max_depth: continue
+        seen.add(key)
         
-        html, error = fetch(url)
+        html, error = fetch(url, verify_ssl)
         
         if error:
             errors.append(f"{url}: {error}")
             continue
             
-        txt = clean_text(html)
+        txt, hrefs = parse_page(html)
         if txt:
-            texts.append(txt[:40000])
+            texts.append(utf8_truncate(txt, PAGE_TEXT_BYTES))
             print(f"  extracted {len(txt)} chars from {url}")
         else:
             errors.append(f"{url}: EMPTY_CONTENT")
         
-        if html:
-            soup = BeautifulSoup(html, "html.parser")
-            for a in soup.find_all("a", href=True):
-                nxt = urljoin(root, a["href"])
-                if nxt.startswith(root) and nxt not in seen and len(seen) < max_pages:
-                    q.append((nxt, d+1))
+        for href in hrefs:
+            nxt = urljoin(root, href)
+            if nxt.startswith(root) and canonical_url(nxt) not in seen and len(seen) < max_pages:
+                q.append((nxt, d+1))
         
         time.sleep(random.uniform(*SLEEP_BETWEEN))
     
-    combined = "\n".join(texts)[:180000]
+    combined = utf8_truncate("\n".join(texts), SITE_TEXT_BYTES)
     
     if not combined:
         error_summary = "; ".join(errors[:3])
@@ -447,7 +525,7 @@ def gemini_json(prompt: str, schema: dict):
                     response_schema=schema
                 )
             )
-            return json.loads(resp.text)
+            return json_loads(resp.text)
         except Exception as e:
             print(f"gemini error (attempt {i+1}): {str(e)[:100]}")
             if i == MAX_RETRIES_GEMINI-1: 
@@ -543,7 +621,7 @@ persian translation: [ترجمه فارسی]"""
 
 
 # worker & main (fixed)
-def worker(q: Queue, results: list):
+def worker(q: Queue, results: list, log):
     while True:
         try:
             root = q.get_nowait()
@@ -581,15 +659,14 @@ def worker(q: Queue, results: list):
             }
             print(f"exception for {root}: {str(e)[:100]}")
         
+        # one line per site, the full array is written once at the end
         with lock:
             results.append(data)
             try:
-                Path(OUTPUT_JSON).write_text(
-                    json.dumps(results, ensure_ascii=False, indent=2), 
-                    encoding="utf-8"
-                )
+                log.write(json_line(data))
+                log.flush()
             except Exception as e:
-                print(f"failed to save json: {e}")
+                print(f"failed to append jsonl: {e}")
         
         q.task_done()
         time.sleep(random.uniform(*SLEEP_BETWEEN))
@@ -608,13 +685,20 @@ def main():
     q = Queue()
     for r in roots: q.put(r)
 
-    threads = []
-    for _ in range(min(THREAD_COUNT, len(roots))):
-        t = threading.Thread(target=worker, args=(q, results), daemon=True)
-        t.start()
-        threads.append(t)
-    
-    for t in threads: t.join()
+    with open_log(OUTPUT_JSONL) as log:
+        threads = []
+        for _ in range(min(THREAD_COUNT, len(roots))):
+            t = threading.Thread(target=worker, args=(q, results, log), daemon=True)
+            t.start()
+            threads.append(t)
+        
+        for t in threads: t.join()
+
+    try:
+        Path(OUTPUT_JSON).write_bytes(json_dump_bytes(results))
+        OUTPUT_JSONL.unlink(missing_ok=True)
+    except Exception as e:
+        print(f"failed to save json: {e}")
 
     print("\n" + "="*60)
     print("creating excel report")
@@ -645,7 +729,11 @@ def main():
     try:
         tmp = TEMP_EXCEL
         df.to_excel(tmp, index=False)
-        shutil.move(tmp, OUTPUT_EXCEL)
+        try:
+            os.replace(tmp, OUTPUT_EXCEL)
+        except OSError:
+            # TEMP_EXCEL overridden onto another filesystem
+            shutil.move(tmp, OUTPUT_EXCEL)
         print(f"excel saved: {OUTPUT_EXCEL}")
     except Exception as e:
         print(f"failed to save excel: {e}")